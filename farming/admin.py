@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import UserProfile
-from .models import DiseaseDetection, CropRecommendation, MarketPrice
+from .models import DiseaseDetection, DiseaseJob, CropRecommendation, MarketPrice, MarketSnapshot
 
 
 @admin.register(UserProfile)
@@ -20,5 +20,17 @@ class CropRecommendationAdmin(admin.ModelAdmin):
 
 @admin.register(MarketPrice)
 class MarketPriceAdmin(admin.ModelAdmin):
-	list_display = ("user", "crop_name", "estimated_price", "created_at")
+	list_display = ("user", "crop_name", "estimated_price", "trend", "forecast_date", "created_at")
 	search_fields = ("user__username", "crop_name")
+
+@admin.register(MarketSnapshot)
+class MarketSnapshotAdmin(admin.ModelAdmin):
+	list_display = ("crop", "date", "days_ahead", "data_version", "created_at")
+	list_filter = ("date",)
+	search_fields = ("crop",)
+
+@admin.register(DiseaseJob)
+class DiseaseJobAdmin(admin.ModelAdmin):
+	list_display = ("user", "status", "attempts", "worker", "created_at", "finished_at")
+	list_filter = ("status",)
+	search_fields = ("user__username",)
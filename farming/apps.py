@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class FarmingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'farming'
+
+    def ready(self):
+        # Preload models before gunicorn forks workers (see gunicorn.conf.py)
+        if getattr(settings, "FARMING_WARMUP", False):
+            from farming.warmup import warm_up
+            warm_up()
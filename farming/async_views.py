@@ -0,0 +1,189 @@
+"""
+Async versions of the crop, disease and market views for ASGI.
+
+CPU work (image decoding and classification, crop model lookups, market
+forecasts) runs in the bounded process pool from offload.py and database
+writes use the async ORM, so one ASGI worker keeps many slow uploads in
+flight. When the pool is full the views answer 503 with Retry-After.
+Routed instead of the sync views when FARMING_ASYNC_VIEWS is set (asgi.py
+sets it).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+
+from .models import CropRecommendation, DiseaseDetection, MarketPrice
+from .offload import Overloaded, run_cpu
+
+# Templates may touch request.user and the session, so render off the loop
+arender = sync_to_async(render)
+
+
+def busy_response():
+    response = HttpResponse(
+        "The server is busy. Please try again in a few seconds.",
+        status=503,
+        content_type="text/plain; charset=utf-8",
+    )
+    response["Retry-After"] = str(settings.INFERENCE_RETRY_AFTER)
+    return response
+
+
+@login_required(login_url='login')
+async def crop_recommend(request):
+    from farming.ml.crop_table import lookup_crops
+    from farming.ml.soil_mapper import map_soil_inputs
+
+    result = None
+    error = None
+
+    if request.method == "POST":
+        fertility = request.POST['fertility']
+        soil_type = request.POST['soil_type']
+        climate = request.POST['climate']
+        rainfall = request.POST['rainfall']
+
+        N, P, K, temperature, humidity, ph, rainfall_mm = map_soil_inputs(
+            fertility, soil_type, climate, rainfall
+        )
+
+        try:
+            results = await run_cpu(lookup_crops, fertility, soil_type, climate, rainfall, 3)
+        except Overloaded:
+            return busy_response()
+        except FileNotFoundError as exc:
+            error = str(exc)
+            results = None
+
+        if results:
+            await CropRecommendation.objects.acreate(
+                user=await request.auser(),
+                recommended_crop=results[0]["crop"],
+                recommended_crops=[r["crop"] for r in results],
+                fertility=fertility,
+                soil_type=soil_type,
+                climate=climate,
+                rainfall_level=rainfall,
+                rainfall=rainfall_mm,
+                temperature=temperature,
+                humidity=humidity,
+                ph=ph,
+            )
+
+        result = results
+
+    return await arender(request, 'farming/crop.html', {'result': result, 'error': error})
+
+
+async def disease_detection(request):
+    from farming.disease import cache as disease_cache
+    from farming.disease.predictor import predict_disease
+
+    result = None
+
+    if request.method == "POST":
+        image = request.FILES.get("image")
+
+        if not image:
+            messages.error(request, "Please upload a plant leaf image.")
+            return redirect("disease")
+
+        if settings.DISEASE_JOB_QUEUE:
+            from .views import enqueue_disease_job
+
+            return await sync_to_async(enqueue_disease_job)(request, image)
+
+        try:
+            # Plain file I/O: no need to queue behind the ORM's thread
+            data = await sync_to_async(image.read, thread_sensitive=False)()
+            key = disease_cache.content_hash(data)
+            cached = disease_cache.lookup(key)
+
+            stored_name = None
+            if cached:
+                disease, confidence = cached["disease"], cached["confidence"]
+                if await sync_to_async(default_storage.exists, thread_sensitive=False)(cached["image"]):
+                    stored_name = cached["image"]
+            else:
+                disease, confidence = await run_cpu(predict_disease, data)
+
+            detection = DiseaseDetection(
+                user=await request.auser(),
+                disease_name=disease.replace("___", " - "),
+                confidence=round(confidence, 2)
+            )
+            if stored_name:
+                detection.image.name = stored_name
+            else:
+                image.seek(0)
+                detection.image = image
+            await detection.asave()
+
+            disease_cache.remember(key, disease, confidence, detection.image.name)
+
+            result = {
+                "disease": detection.disease_name,
+                "confidence": detection.confidence
+            }
+
+        except Overloaded:
+            return busy_response()
+        except Exception as e:
+            messages.error(request, f"Error processing image: {str(e)}")
+            return redirect("disease")
+
+    return await arender(request, "farming/disease.html", {"result": result})
+
+
+async def market_prediction(request):
+    from farming.ml.market_cache import aget_comparison
+    from farming.ml.market_predict import data_version, get_all_crops
+    from farming.ml.market_snapshots import aget_snapshot
+
+    result = None
+    comparison = None
+
+    if request.method == "POST":
+        crop = request.POST.get('crop', '')
+        action = request.POST.get('action', 'predict')
+
+        try:
+            if action == 'predict' and crop:
+                snapshot = await aget_snapshot(crop, days_ahead=30)
+                if snapshot:
+                    forecast, insights = snapshot
+                    result = dict(forecast)
+                    result['insights'] = insights
+                    result['forecast'] = list(zip(result['dates'], result['prices']))
+
+            elif action == 'compare':
+                selected_crops = request.POST.getlist('compare_crops')
+                comparison = await aget_comparison(selected_crops, days_ahead=30)
+                if request.POST.get('format') == 'json':
+                    return JsonResponse(comparison)
+        except Overloaded:
+            return busy_response()
+
+        user = await request.auser()
+        if result and user.is_authenticated:
+            await MarketPrice.objects.acreate(
+                user=user,
+                crop_name=crop,
+                estimated_price=result['avg_price'],
+                min_price=result['min_price'],
+                max_price=result['max_price'],
+                trend=result['trend'],
+                forecast_date=result['dates'][0],
+                days_ahead=len(result['dates']),
+                data_version=data_version(),
+            )
+
+    return await arender(request, 'farming/market.html', {
+        'result': result,
+        'crops': get_all_crops(),
+        'comparison': comparison['stats'] if comparison else None,
+    })
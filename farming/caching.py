@@ -0,0 +1,59 @@
+"""
+Whole-page caching for anonymous visitors.
+
+Django's cache_page varies on the Cookie header once a page uses
+{% csrf_token %}, so every visitor gets their own entry. Here the page is
+stored once per (path, language) with the CSRF token swapped for a
+placeholder, and each hit gets the visitor's own token put back.
+"""
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+
+CSRF_PLACEHOLDER = b"__csrf_token_placeholder__"
+_CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.GET
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def page_cache_key(path, language):
+    return f"page:{language}:{path}"
+
+
+def cache_anonymous_page(view):
+    """Serve anonymous GETs of view from the cache for PAGE_CACHE_SECONDS."""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not settings.PAGE_CACHE_SECONDS or not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request.path, get_language())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            token = get_token(request).encode()
+            return HttpResponse(content.replace(CSRF_PLACEHOLDER, token), content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, "render") and callable(response.render):
+                response.render()
+            content = _CSRF_INPUT.sub(rb"\1" + CSRF_PLACEHOLDER + rb"\2", response.content)
+            cache.set(key, (content, response["Content-Type"]), settings.PAGE_CACHE_SECONDS)
+        return response
+
+    return wrapped
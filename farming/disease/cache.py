@@ -0,0 +1,61 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping with a fixed entry cap."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_results = LRUCache(getattr(settings, "DISEASE_RESULT_CACHE_SIZE", 1024))
+
+
+def content_hash(data):
+    """Fast 128-bit digest of the raw upload bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def lookup(key):
+    """
+    Cached entry for an upload hash, or None.
+
+    Entries are dicts with the predict_disease "disease" and "confidence"
+    plus the storage name of the "image" already saved for those bytes.
+    """
+    return _results.get(key)
+
+
+def remember(key, disease, confidence, image_name):
+    _results.set(key, {
+        "disease": disease,
+        "confidence": confidence,
+        "image": image_name,
+    })
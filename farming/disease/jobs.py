@@ -0,0 +1,155 @@
+"""
+Database-backed queue for disease uploads.
+
+With DISEASE_JOB_QUEUE on, the disease view stores the upload as a
+DiseaseJob and answers at once. Workers started by
+``python manage.py run_disease_worker`` claim pending jobs in batches of
+DISEASE_JOB_BATCH_SIZE, classify them with predict_disease_batch and
+write the DiseaseDetection rows. The detection reuses the job's stored
+image, so each upload is written to disk once.
+
+Jobs left running for DISEASE_JOB_TIMEOUT seconds (a worker died) are
+claimed again, up to DISEASE_JOB_MAX_ATTEMPTS times before failing.
+"""
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from farming.disease import cache as disease_cache
+from farming.models import DiseaseDetection, DiseaseJob
+
+
+def enqueue(user, image):
+    """Store an uploaded image as a pending job (reusing the stored file for known images)."""
+    image.seek(0)
+    key = disease_cache.content_hash(image.read())
+    cached = disease_cache.lookup(key)
+
+    job = DiseaseJob(user=user, content_hash=key)
+    if cached and default_storage.exists(cached["image"]):
+        job.image.name = cached["image"]
+    else:
+        image.seek(0)
+        job.image = image
+    job.save()
+    return job
+
+
+def job_status(job):
+    """JSON-ready status of a job, with the result once it is done."""
+    status = {"job": job.pk, "status": job.status}
+    if job.status == DiseaseJob.DONE and job.detection:
+        status["disease"] = job.detection.disease_name
+        status["confidence"] = job.detection.confidence
+    elif job.status == DiseaseJob.FAILED:
+        status["error"] = job.error
+    return status
+
+
+# ---------- worker ----------
+
+def claim(worker, limit):
+    """Mark up to `limit` of the oldest claimable jobs as running for this worker."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DISEASE_JOB_TIMEOUT)
+    abandoned = Q(status=DiseaseJob.RUNNING, started_at__lt=stale)
+
+    with transaction.atomic():
+        DiseaseJob.objects.filter(
+            abandoned, attempts__gte=settings.DISEASE_JOB_MAX_ATTEMPTS
+        ).update(status=DiseaseJob.FAILED, error="Worker stopped while processing", finished_at=now)
+
+        # SKIP LOCKED lets PostgreSQL workers claim side by side; SQLite
+        # serialises the whole transaction instead
+        ids = list(
+            DiseaseJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=DiseaseJob.PENDING) | abandoned)
+            .order_by("created_at")
+            .values_list("pk", flat=True)[:limit]
+        )
+        DiseaseJob.objects.filter(pk__in=ids).update(
+            status=DiseaseJob.RUNNING, worker=worker, started_at=now, attempts=F("attempts") + 1,
+        )
+
+    return list(DiseaseJob.objects.filter(pk__in=ids, worker=worker, status=DiseaseJob.RUNNING))
+
+
+def _read(job):
+    try:
+        with default_storage.open(job.image.name, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def process(jobs):
+    """Classify a batch of claimed jobs and store their detections."""
+    from farming.disease.predictor import predict_disease_batch
+
+    # Images seen before (in this worker) are not classified again
+    predictions = {}
+    pending = {}
+    for job in jobs:
+        cached = disease_cache.lookup(job.content_hash)
+        if cached:
+            predictions[job.pk] = (cached["disease"], cached["confidence"])
+        else:
+            pending[job.pk] = _read(job)
+
+    readable = [pk for pk, data in pending.items() if data is not None]
+    # One core per worker process: don't fan decoding out to threads as well
+    results = predict_disease_batch([pending[pk] for pk in readable], max_workers=1)
+    predictions.update(zip(readable, results))
+
+    now = timezone.now()
+    detections = []
+    for job in jobs:
+        prediction = predictions.get(job.pk)
+        job.finished_at = now
+        if prediction is None:
+            job.status = DiseaseJob.FAILED
+            job.error = "Could not read image"
+            continue
+
+        disease, confidence = prediction
+        job.status = DiseaseJob.DONE
+        job.detection = DiseaseDetection(
+            user_id=job.user_id,
+            disease_name=disease.replace("___", " - "),
+            confidence=round(confidence, 2),
+        )
+        job.detection.image.name = job.image.name
+        detections.append(job.detection)
+        disease_cache.remember(job.content_hash, disease, confidence, job.image.name)
+
+    with transaction.atomic():
+        DiseaseDetection.objects.bulk_create(detections)
+        DiseaseJob.objects.bulk_update(jobs, ["status", "detection", "error", "finished_at"])
+
+
+def run_worker(batch_size=None, poll_seconds=None, once=False):
+    """
+    Claim and process batches until interrupted (or, with once, until the
+    queue is empty). Returns the number of jobs processed.
+    """
+    batch_size = batch_size or settings.DISEASE_JOB_BATCH_SIZE
+    poll_seconds = poll_seconds if poll_seconds is not None else settings.DISEASE_JOB_POLL_SECONDS
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    processed = 0
+    while True:
+        jobs = claim(worker, batch_size)
+        if not jobs:
+            if once:
+                return processed
+            time.sleep(poll_seconds)
+            continue
+        process(jobs)
+        processed += len(jobs)
@@ -1,127 +1,163 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from PIL import Image
 
+from farming.disease.rules import compile_rules
+
+IMAGE_SIZE = (224, 224)
+
+FEATURE_NAMES = (
+    "r_mean", "g_mean", "b_mean",
+    "r_std", "g_std", "b_std",
+    "brightness", "greenness", "redness", "yellowness",
+    "edge_density", "spot_ratio",
+)
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def load_image_array(image):
+    """
+    Decode an image to a planar (3, 224, 224) uint8 RGB channel stack.
+
+    image: a path, a binary file-like object (e.g. an upload) or raw bytes.
+    JPEGs are decoded at a reduced DCT scale close to 224x224 via draft(),
+    so large photos are never fully decoded.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = io.BytesIO(image)
+
+    img = Image.open(image)
+    img.draft("RGB", IMAGE_SIZE)
+    img = img.convert("RGB").resize(IMAGE_SIZE)
+    return np.stack([np.asarray(band) for band in img.split()])
+
+
+def extract_features(planes):
+    """
+    Compute all 12 features of a (3, H, W) uint8 channel stack.
+
+    Everything stays in integers until the final divisions: channel sums
+    and sums of squares give exact means and variances, spots are found by
+    comparing uint8 pixels with per-channel cut levels, and red-channel
+    edges are int16 diffs. Returns a float64 vector ordered as FEATURE_NAMES.
+    """
+    n_pixels = planes.shape[1] * planes.shape[2]
+    flat = planes.reshape(3, -1)
+
+    # uint32 cannot overflow while n_pixels * 255**2 < 2**32 (224x224 is fine)
+    acc = np.uint32 if n_pixels * 255 ** 2 < 2 ** 32 else np.uint64
+    sums = flat.sum(axis=1, dtype=acc).astype(np.int64)
+    squares = flat.astype(np.uint16)
+    np.multiply(squares, squares, out=squares)
+    sum_squares = squares.sum(axis=1, dtype=acc).astype(np.int64)
+
+    means = sums / n_pixels
+    stds = np.sqrt((n_pixels * sum_squares - sums * sums) / n_pixels ** 2)
+    r_mean, g_mean, b_mean = means
+
+    # |level - mean| > 40 holds on two tails: levels < low and levels >= high
+    deviation = _LEVELS[None, :] - means[:, None]
+    lows = np.count_nonzero(deviation < -40, axis=1).tolist()
+    highs = (256 - np.count_nonzero(deviation > 40, axis=1)).tolist()
+
+    spots = np.zeros(n_pixels, dtype=bool)
+    for channel, low, high in zip(flat, lows, highs):
+        if low > 0:
+            spots |= channel < low
+        if high < 256:
+            spots |= channel >= high
+
+    r = planes[0].astype(np.int16)
+    edges = np.abs(r[:, 1:] - r[:, :-1]).sum() + np.abs(r[1:] - r[:-1]).sum()
+
+    return np.array([
+        r_mean, g_mean, b_mean,
+        *stds,
+        (r_mean + g_mean + b_mean) / 3,
+        g_mean - (r_mean + b_mean) / 2,
+        r_mean - b_mean,
+        (r_mean + g_mean) / 2 - b_mean,
+        edges / 1_000_000,
+        np.count_nonzero(spots) / n_pixels,
+    ])
+
+
+def analyze_image_features(image):
+    return dict(zip(FEATURE_NAMES, extract_features(load_image_array(image))))
+
+
+_rules = None  # lazily compiled rule table
+
+
+def get_rules():
+    global _rules
+    if _rules is None:
+        _rules = compile_rules(FEATURE_NAMES)
+    return _rules
+
+
+def classify_features(f):
+    """Run the rule table on one feature dict -> (label, confidence)."""
+    row = np.array([[f[name] for name in FEATURE_NAMES]], dtype=np.float64)
+    return get_rules().classify(row)[0]
+
+
+def classify_feature_matrix(features):
+    """Classify every row of an (n, 12) FEATURE_NAMES-ordered matrix in one pass."""
+    features = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+    return get_rules().classify(features)
+
+
+def predict_disease(image):
+    """
+    Classify a leaf image (path, file-like object or bytes) -> (label, confidence).
+
+    Bytes are sent to the inference server when one is running.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        from farming import inference_service
+
+        try:
+            return tuple(inference_service.call("disease", bytes(image)))
+        except inference_service.Unavailable:
+            pass
+        except Exception as e:
+            raise Exception(f"Prediction failed: {str(e)}")
 
-def analyze_image_features(image_path):
-    img = Image.open(image_path).convert("RGB")
-    img = img.resize((224, 224))
-    img_array = np.array(img).astype(float)
-
-    r = img_array[:, :, 0]
-    g = img_array[:, :, 1]
-    b = img_array[:, :, 2]
-
-    r_mean, g_mean, b_mean = r.mean(), g.mean(), b.mean()
-    r_std, g_std, b_std = r.std(), g.std(), b.std()
-
-    brightness = (r_mean + g_mean + b_mean) / 3
-    greenness = g_mean - (r_mean + b_mean) / 2
-    redness = r_mean - b_mean
-    yellowness = (r_mean + g_mean) / 2 - b_mean
-
-    edges_h = np.abs(np.diff(r, axis=1)).sum()
-    edges_v = np.abs(np.diff(r, axis=0)).sum()
-    edge_density = (edges_h + edges_v) / 1_000_000
-
-    spot_pixels = (
-        (np.abs(r - r_mean) > 40) |
-        (np.abs(g - g_mean) > 40) |
-        (np.abs(b - b_mean) > 40)
-    ).sum()
-
-    spot_ratio = spot_pixels / (224 * 224)
-
-    return {
-        "r_mean": r_mean,
-        "g_mean": g_mean,
-        "b_mean": b_mean,
-        "r_std": r_std,
-        "g_std": g_std,
-        "b_std": b_std,
-        "brightness": brightness,
-        "greenness": greenness,
-        "redness": redness,
-        "yellowness": yellowness,
-        "edge_density": edge_density,
-        "spot_ratio": spot_ratio,
-    }
-
-
-def predict_disease(image_path):
     try:
-        f = analyze_image_features(image_path)
-
-        # ---------- TOMATO DISEASES (STRICT ORDER) ----------
-
-        if f["yellowness"] > 28 and f["g_mean"] > 140 and f["brightness"] > 145:
-            return "Tomato___Yellow_Leaf_Curl_Virus", 76
-
-        if (
-            f["brightness"] > 165 and
-            f["edge_density"] < 0.15 and
-            (f["r_std"] + f["g_std"] + f["b_std"]) < 35
-        ):
-            return "Tomato___Mosaic_virus", 74
-
-        if f["brightness"] < 115 and f["greenness"] < 8 and f["spot_ratio"] > 0.18:
-            return "Tomato___Late_blight", 81
-
-        if (
-            10 < f["redness"] < 30 and
-            120 < f["brightness"] < 150 and
-            f["spot_ratio"] > 0.12
-        ):
-            return "Tomato___Early_blight", 80
-
-        if (
-            0.20 < f["edge_density"] < 0.45 and
-            0.10 < f["spot_ratio"] < 0.25
-        ):
-            return "Tomato___Septoria_leaf_spot", 77
-
-        if (
-            0.35 < f["edge_density"] < 0.55 and
-            0.15 < f["spot_ratio"] < 0.35
-        ):
-            return "Tomato___Target_Spot", 78
-
-        if (
-            150 < f["brightness"] < 165 and
-            8 < f["redness"] < 18 and
-            f["edge_density"] < 0.25
-        ):
-            return "Tomato___Leaf_Mold", 75
-
-        if f["yellowness"] > 15 and f["edge_density"] > 0.25 and f["redness"] > 8:
-            return "Tomato___Spider_mites", 72
-
-        if (
-            f["edge_density"] > 0.55 and
-            f["spot_ratio"] > 0.20 and
-            f["brightness"] < 135 and
-            f["redness"] > 12
-        ):
-            return "Tomato___Bacterial_spot", 79
-
-        if f["greenness"] > 25 and f["redness"] < 5 and f["spot_ratio"] < 0.08:
-            return "Tomato___Healthy", 87
-
-        # ---------- CORN ----------
-        if f["g_mean"] > 145 and f["r_mean"] > 135:
-            return "Corn___Common_rust", 71
-
-        if f["greenness"] > 18:
-            return "Corn___Healthy", 73
-
-        # ---------- APPLE ----------
-        if f["redness"] > 30:
-            return "Apple___Black_rot", 70
-
-        if f["yellowness"] > 25:
-            return "Apple___Cedar_apple_rust", 69
-
-        # ---------- FALLBACK ----------
-        return "Healthy Leaf", 60
+        return classify_features(analyze_image_features(image))
 
     except Exception as e:
         raise Exception(f"Prediction failed: {str(e)}")
+
+
+def _features_or_none(image):
+    try:
+        return extract_features(load_image_array(image))
+    except Exception:
+        return None
+
+
+def predict_disease_batch(images, max_workers=None):
+    """
+    Classify many images at once.
+
+    Decoding and feature extraction run in a thread pool (PIL and NumPy
+    release the GIL), then the cascade runs over the stacked feature
+    matrix. Returns one (label, confidence) per image, or None for images
+    that could not be decoded.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(_features_or_none, images))
+
+    decoded = [i for i, row in enumerate(rows) if row is not None]
+    results = [None] * len(rows)
+    if decoded:
+        matrix = np.vstack([rows[i] for i in decoded])
+        for i, prediction in zip(decoded, classify_feature_matrix(matrix)):
+            results[i] = prediction
+
+    return results
@@ -0,0 +1,143 @@
+"""
+Declarative disease rules, compiled into NumPy masks.
+
+Each rule is (label, confidence, bounds) where bounds maps a feature name
+to an exclusive (lower, upper) pair; None leaves that side open. Rules are
+tried in order and the first one whose bounds all hold wins. Set the
+DISEASE_RULES_FILE environment variable to a JSON list of
+{"label", "confidence", "bounds"} objects to tune thresholds without a
+code change.
+"""
+import json
+import os
+
+import numpy as np
+
+from farming.disease.labels import CLASS_NAMES
+
+# Features computed from the base FEATURE_NAMES before matching
+DERIVED_FEATURES = {
+    "std_sum": ("r_std", "g_std", "b_std"),
+}
+
+DISEASE_RULES = [
+    # ---------- TOMATO DISEASES (STRICT ORDER) ----------
+    ("Tomato___Yellow_Leaf_Curl_Virus", 76, {
+        "yellowness": (28, None), "g_mean": (140, None), "brightness": (145, None),
+    }),
+    ("Tomato___Mosaic_virus", 74, {
+        "brightness": (165, None), "edge_density": (None, 0.15), "std_sum": (None, 35),
+    }),
+    ("Tomato___Late_blight", 81, {
+        "brightness": (None, 115), "greenness": (None, 8), "spot_ratio": (0.18, None),
+    }),
+    ("Tomato___Early_blight", 80, {
+        "redness": (10, 30), "brightness": (120, 150), "spot_ratio": (0.12, None),
+    }),
+    ("Tomato___Septoria_leaf_spot", 77, {
+        "edge_density": (0.20, 0.45), "spot_ratio": (0.10, 0.25),
+    }),
+    ("Tomato___Target_Spot", 78, {
+        "edge_density": (0.35, 0.55), "spot_ratio": (0.15, 0.35),
+    }),
+    ("Tomato___Leaf_Mold", 75, {
+        "brightness": (150, 165), "redness": (8, 18), "edge_density": (None, 0.25),
+    }),
+    ("Tomato___Spider_mites", 72, {
+        "yellowness": (15, None), "edge_density": (0.25, None), "redness": (8, None),
+    }),
+    ("Tomato___Bacterial_spot", 79, {
+        "edge_density": (0.55, None), "spot_ratio": (0.20, None),
+        "brightness": (None, 135), "redness": (12, None),
+    }),
+    ("Tomato___Healthy", 87, {
+        "greenness": (25, None), "redness": (None, 5), "spot_ratio": (None, 0.08),
+    }),
+    # ---------- CORN ----------
+    ("Corn___Common_rust", 71, {"g_mean": (145, None), "r_mean": (135, None)}),
+    ("Corn___Healthy", 73, {"greenness": (18, None)}),
+    # ---------- APPLE ----------
+    ("Apple___Black_rot", 70, {"redness": (30, None)}),
+    ("Apple___Cedar_apple_rust", 69, {"yellowness": (25, None)}),
+]
+
+# ---------- FALLBACK ----------
+FALLBACK = ("Healthy Leaf", 60)
+
+
+class CompiledRules:
+    """A rule list turned into bound matrices for first-match evaluation."""
+
+    def __init__(self, rules, feature_names, fallback=FALLBACK):
+        self.feature_names = tuple(feature_names)
+        self.columns = self.feature_names + tuple(DERIVED_FEATURES)
+        self.fallback = fallback
+        self.labels = [label for label, _, _ in rules]
+        self.confidences = [confidence for _, confidence, _ in rules]
+
+        index = {name: i for i, name in enumerate(self.columns)}
+        shape = (len(rules), len(self.columns))
+        self.lower = np.zeros(shape)
+        self.upper = np.zeros(shape)
+        self.has_lower = np.zeros(shape, dtype=bool)
+        self.has_upper = np.zeros(shape, dtype=bool)
+
+        for r, (label, _, bounds) in enumerate(rules):
+            if label not in CLASS_NAMES:
+                raise ValueError(f"Unknown disease label in rules: {label}")
+            for feature, (lower, upper) in bounds.items():
+                if feature not in index:
+                    raise ValueError(f"Unknown feature in rule {label}: {feature}")
+                c = index[feature]
+                if lower is not None:
+                    self.lower[r, c], self.has_lower[r, c] = lower, True
+                if upper is not None:
+                    self.upper[r, c], self.has_upper[r, c] = upper, True
+
+    def _with_derived(self, features):
+        index = {name: i for i, name in enumerate(self.feature_names)}
+        derived = []
+        for parts in DERIVED_FEATURES.values():
+            total = features[:, index[parts[0]]]
+            for part in parts[1:]:
+                total = total + features[:, index[part]]
+            derived.append(total)
+        return np.column_stack([features, *derived])
+
+    def match(self, features):
+        """Index of the first matching rule per row, -1 where none matches."""
+        X = self._with_derived(np.asarray(features, dtype=np.float64))[:, None, :]
+
+        ok = (
+            (~self.has_lower | (X > self.lower)) &
+            (~self.has_upper | (X < self.upper))
+        ).all(axis=2)
+
+        first = np.argmax(ok, axis=1)
+        return np.where(ok.any(axis=1), first, -1)
+
+    def classify(self, features):
+        """(label, confidence) for every row of an (n, len(feature_names)) matrix."""
+        return [
+            (self.labels[i], self.confidences[i]) if i >= 0 else self.fallback
+            for i in self.match(features).tolist()
+        ]
+
+
+def load_rules_file(path):
+    """Read a rule list from JSON: [{"label", "confidence", "bounds": {f: [lo, hi]}}]."""
+    with open(path) as f:
+        entries = json.load(f)
+    return [
+        (entry["label"], entry["confidence"], {
+            feature: tuple(bounds) for feature, bounds in entry["bounds"].items()
+        })
+        for entry in entries
+    ]
+
+
+def compile_rules(feature_names):
+    """Compile DISEASE_RULES, or the DISEASE_RULES_FILE override if set."""
+    path = os.environ.get("DISEASE_RULES_FILE")
+    rules = load_rules_file(path) if path else DISEASE_RULES
+    return CompiledRules(rules, feature_names)
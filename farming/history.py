@@ -0,0 +1,123 @@
+"""
+Merged, keyset-paginated history across DiseaseDetection,
+CropRecommendation and MarketPrice.
+
+A page is one UNION ALL query over the three tables, newest first,
+ordered by (created_at desc, kind, id desc). The cursor is the last
+entry's (created_at, kind, id), so each page is an index range scan on
+(user, created_at) however long the history is.
+"""
+import json
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+from django.db.models import CharField, F, FloatField, Q, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import CropRecommendation, DiseaseDetection, MarketPrice
+
+PAGE_SIZE = 20
+
+
+def _disease(user):
+    return DiseaseDetection.objects.filter(user=user).annotate(
+        kind=Value("disease", output_field=CharField()),
+        title=F("disease_name"),
+        detail=Value("", output_field=CharField()),
+        value=Cast("confidence", FloatField()),
+        image_name=Cast("image", CharField()),
+        crops=Value("", output_field=CharField()),
+    )
+
+
+def _crop(user):
+    return CropRecommendation.objects.filter(user=user).annotate(
+        kind=Value("crop", output_field=CharField()),
+        title=F("recommended_crop"),
+        detail=Concat(
+            "fertility", Value(" · "), "soil_type", Value(" · "), "climate",
+            output_field=CharField(),
+        ),
+        value=Cast("rainfall", FloatField()),
+        image_name=Value("", output_field=CharField()),
+        crops=Cast("recommended_crops", CharField()),  # JSON text
+    )
+
+
+def _market(user):
+    return MarketPrice.objects.filter(user=user).annotate(
+        kind=Value("market", output_field=CharField()),
+        title=F("crop_name"),
+        detail=F("trend"),
+        value=Cast("estimated_price", FloatField()),
+        image_name=Value("", output_field=CharField()),
+        crops=Value("", output_field=CharField()),
+    )
+
+
+SOURCES = (("crop", _crop), ("disease", _disease), ("market", _market))
+COLUMNS = ("id", "created_at", "kind", "title", "detail", "value", "image_name", "crops")
+
+
+def encode_cursor(entry):
+    return f"{entry['created_at'].isoformat()}|{entry['kind']}|{entry['id']}"
+
+
+def decode_cursor(cursor):
+    """(created_at, kind, id) from encode_cursor output; ValueError if malformed."""
+    created_at, kind, pk = cursor.split("|")
+    if kind not in dict(SOURCES):
+        raise ValueError(f"Unknown history kind: {kind}")
+    return datetime.fromisoformat(created_at), kind, int(pk)
+
+
+def _after(kind, cursor):
+    """Rows of one source that sort after the cursor entry."""
+    created_at, cursor_kind, pk = cursor
+    older = Q(created_at__lt=created_at)
+    if kind > cursor_kind:
+        return older | Q(created_at=created_at)
+    if kind == cursor_kind:
+        return older | Q(created_at=created_at, id__lt=pk)
+    return older
+
+
+def timeline_page(user, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of the user's history, newest first, in a single query.
+
+    cursor is the "next" value from the previous page (None for the first
+    page). Returns {"entries": [dict], "next": cursor or None}; entries
+    have the COLUMNS keys plus "image_url" for disease images, and
+    "crops" is the ranked crop list for crop recommendations.
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    querysets = []
+    for kind, source in SOURCES:
+        queryset = source(user)
+        if after is not None:
+            queryset = queryset.filter(_after(kind, after))
+        # Bound each branch to one page of its own index range; SQLite
+        # refuses LIMIT directly inside a compound SELECT, so via a subquery
+        newest = queryset.order_by("-created_at", "-id").values("pk")[:page_size + 1]
+        querysets.append(queryset.filter(pk__in=newest).values_list(*COLUMNS))
+
+    first, *rest = querysets
+    rows = list(
+        first.union(*rest, all=True).order_by("-created_at", "kind", "-id")[:page_size + 1]
+    )
+
+    entries = [dict(zip(COLUMNS, row)) for row in rows[:page_size]]
+    for entry in entries:
+        name = entry["image_name"]
+        entry["image_url"] = default_storage.url(name) if name else ""
+        if entry["kind"] == "crop":
+            entry["crops"] = json.loads(entry["crops"] or "[]") or [entry["title"]]
+        else:
+            entry["crops"] = []
+
+    return {
+        "entries": entries,
+        "next": encode_cursor(entries[-1]) if len(rows) > page_size else None,
+    }
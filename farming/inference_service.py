@@ -0,0 +1,240 @@
+"""
+Local inference server with micro-batching.
+
+``python manage.py run_inference_server`` listens on the Unix socket
+INFERENCE_SERVER_SOCKET. Requests that arrive within
+INFERENCE_SERVER_MAX_WAIT_MS of each other (up to
+INFERENCE_SERVER_MAX_BATCH) are run as one predict_crops_batch or
+predict_disease_batch call.
+
+predict_crops and predict_disease go through call() first. If the server
+isn't running or doesn't answer within INFERENCE_SERVER_TIMEOUT, call()
+raises Unavailable and the caller runs inference in-process. Failed
+connections are not retried for RECONNECT_AFTER seconds.
+"""
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_AFTER = 5.0  # seconds to stay in-process after a failed connect
+
+
+class Unavailable(Exception):
+    """The inference server could not be reached; infer in-process."""
+
+
+def _authkey():
+    return hashlib.sha256(b"farming-inference:" + settings.SECRET_KEY.encode()).digest()
+
+
+# ---------- server ----------
+
+def _run_crop_batch(payloads):
+    from farming.ml.crop_predict import predict_crops_batch
+
+    # Results are prefix-stable in top_k, so run the largest and truncate
+    top_k = max(top_k for _, top_k in payloads)
+    results = predict_crops_batch([features for features, _ in payloads], top_k=top_k)
+    return [result[:k] for result, (_, k) in zip(results, payloads)]
+
+
+def _run_disease_batch(payloads):
+    from farming.disease.predictor import predict_disease_batch
+
+    return [
+        result if result is not None else ValueError("Image could not be decoded")
+        for result in predict_disease_batch(payloads)
+    ]
+
+
+BATCH_RUNNERS = {
+    "crop": _run_crop_batch,
+    "disease": _run_disease_batch,
+}
+
+
+class MicroBatcher:
+    """Collects submitted payloads for up to max_wait seconds and runs them as one batch."""
+
+    def __init__(self, run_batch, max_batch, max_wait):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload):
+        future = Future()
+        self._queue.put((payload, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_alone(self, payload):
+        try:
+            return self.run_batch([payload])[0]
+        except Exception as exc:
+            return exc
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            payloads = [payload for payload, _ in batch]
+            try:
+                results = self.run_batch(payloads)
+            except Exception as exc:
+                # Rerun one by one so a bad payload only fails its own request
+                if len(batch) == 1:
+                    results = [exc]
+                else:
+                    results = [self._run_alone(payload) for payload in payloads]
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def _serve_connection(conn, batchers):
+    """One client connection: a request at a time, answered when its batch is done."""
+    with conn:
+        while True:
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                result = ("ok", batchers[kind].submit(payload).result())
+            except ValueError as exc:
+                # Bad input: raised as ValueError by the client too, as in-process
+                result = ("error", ValueError(str(exc)))
+            except Exception as exc:
+                result = ("error", RuntimeError(f"{type(exc).__name__}: {exc}"))
+
+            try:
+                conn.send(result)
+            except OSError:
+                return
+
+
+def serve(socket_path=None, max_batch=None, max_wait_ms=None, ready=None):
+    """Run the inference server until interrupted. ready(batchers) is called once listening."""
+    socket_path = socket_path or settings.INFERENCE_SERVER_SOCKET
+    max_batch = max_batch or settings.INFERENCE_SERVER_MAX_BATCH
+    max_wait = (max_wait_ms if max_wait_ms is not None else settings.INFERENCE_SERVER_MAX_WAIT_MS) / 1000
+
+    from farming.warmup import warm_up
+    warm_up()
+
+    batchers = {
+        kind: MicroBatcher(run_batch, max_batch, max_wait)
+        for kind, run_batch in BATCH_RUNNERS.items()
+    }
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # left behind by a server that didn't shut down cleanly
+    old_umask = os.umask(0o177)  # socket readable/writable by this user only
+    try:
+        listener = Listener(socket_path, family="AF_UNIX", authkey=_authkey())
+    finally:
+        os.umask(old_umask)
+
+    logger.info("inference server listening on %s", socket_path)
+    if ready is not None:
+        ready(batchers)
+
+    try:
+        with listener:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as exc:  # e.g. a client with the wrong authkey
+                    logger.warning("rejected inference client: %s", exc)
+                    continue
+                threading.Thread(target=_serve_connection, args=(conn, batchers), daemon=True).start()
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ---------- client ----------
+
+_local = threading.local()
+_unavailable_until = 0.0
+
+
+def _connection():
+    global _unavailable_until
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+
+    # Scripts that import the models without Django configured run in-process
+    socket_path = settings.INFERENCE_SERVER_SOCKET if settings.configured else None
+    if not socket_path or time.monotonic() < _unavailable_until:
+        raise Unavailable()
+    try:
+        conn = Client(socket_path, family="AF_UNIX", authkey=_authkey())
+    except (OSError, EOFError, AuthenticationError) as exc:
+        _unavailable_until = time.monotonic() + RECONNECT_AFTER
+        raise Unavailable() from exc
+
+    _local.conn = conn
+    return conn
+
+
+def _drop_connection():
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        conn.close()
+
+
+def call(kind, payload):
+    """
+    Result of a server-side batch for one request. Raises Unavailable if
+    there is no server or it stops answering, ValueError for input the
+    model rejects (as the in-process functions do), and RuntimeError for
+    other server-side failures.
+    """
+    conn = _connection()
+    try:
+        conn.send((kind, payload))
+        if not conn.poll(settings.INFERENCE_SERVER_TIMEOUT):
+            raise TimeoutError()
+        status, result = conn.recv()
+    except (OSError, EOFError, TimeoutError) as exc:
+        _drop_connection()
+        raise Unavailable() from exc
+
+    if status != "ok":
+        raise result
+    return result
@@ -0,0 +1,180 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Environment overrides per mode; "env" keeps the current DB_* settings
+MODES = {
+    "sqlite-default": {"DB_ENGINE": "sqlite", "SQLITE_TUNING": "0"},
+    "sqlite-tuned": {"DB_ENGINE": "sqlite", "SQLITE_TUNING": "1"},
+    "env": {},
+}
+
+VIEWS = ("crop", "disease", "market")
+
+
+def _leaf_png():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (90, 140, 60)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def run_worker(seconds, media_root):
+    """One simulated gunicorn worker: hammer the three write views for `seconds`."""
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    user = User.objects.create_user(f"bench-{uuid.uuid4().hex[:12]}")
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+
+    png = _leaf_png()
+    requests = {
+        "crop": lambda: client.post(reverse("crop"), {
+            "fertility": "medium", "soil_type": "loamy", "climate": "moderate", "rainfall": "medium",
+        }),
+        "disease": lambda: client.post(reverse("disease"), {
+            "image": SimpleUploadedFile("leaf.png", png, content_type="image/png"),
+        }),
+        "market": lambda: client.post(reverse("market"), {"crop": "Rice", "action": "predict"}),
+    }
+    counts = {view: {"ok": 0, "error": 0} for view in VIEWS}
+    latencies = []
+
+    # Signal readiness, then start together with the other workers
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    with override_settings(MEDIA_ROOT=media_root):
+        deadline = time.perf_counter() + seconds
+        i = 0
+        while time.perf_counter() < deadline:
+            view = VIEWS[i % len(VIEWS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = requests[view]()
+                ok = response.status_code < 500
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            counts[view]["ok" if ok else "error"] += 1
+
+    print(json.dumps({"user": user.username, "counts": counts, "latencies": latencies}), flush=True)
+
+
+def count_rows(usernames):
+    from farming.models import CropRecommendation, DiseaseDetection, MarketPrice
+
+    return {
+        "crop": CropRecommendation.objects.filter(user__username__in=usernames).count(),
+        "disease": DiseaseDetection.objects.filter(user__username__in=usernames).count(),
+        "market": MarketPrice.objects.filter(user__username__in=usernames).count(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent write throughput of the crop/, disease/ and market/ views "
+        "with several worker processes, per database mode"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument(
+            "--modes", nargs="+", default=["sqlite-default", "sqlite-tuned"], choices=list(MODES),
+            help="SQLite modes run on a scratch database; env uses the configured DB_* "
+                 "settings (point them at a scratch database)",
+        )
+        parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+        parser.add_argument("--media-root", help=argparse.SUPPRESS)
+        parser.add_argument("--count-users", nargs="*", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            return run_worker(options["seconds"], options["media_root"])
+        if options["count_users"] is not None:
+            return self.stdout.write(json.dumps(count_rows(options["count_users"])))
+
+        for mode in options["modes"]:
+            with tempfile.TemporaryDirectory() as scratch:
+                self.run_mode(mode, scratch, options["workers"], options["seconds"])
+
+    def _manage(self, env, *args, **kwargs):
+        return subprocess.Popen(
+            [sys.executable, sys.argv[0], "bench_db_writes", *args],
+            env=env, text=True, **kwargs,
+        )
+
+    def run_mode(self, mode, scratch, n_workers, seconds):
+        env = {**os.environ, **MODES[mode], "FARMING_WARMUP": "1"}
+        if mode != "env":
+            env["DB_NAME"] = os.path.join(scratch, "bench.sqlite3")
+
+        migrate = subprocess.run(
+            [sys.executable, sys.argv[0], "migrate", "-v0"], env=env, capture_output=True, text=True,
+        )
+        if migrate.returncode:
+            raise CommandError(f"migrate failed for {mode}:\n{migrate.stderr}")
+
+        media_root = os.path.join(scratch, "media")
+        workers = [
+            self._manage(
+                env, "--worker", "--seconds", str(seconds), "--media-root", media_root,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            )
+            for _ in range(n_workers)
+        ]
+        for worker in workers:
+            if worker.stdout.readline().strip() != "ready":
+                raise CommandError(f"A worker failed to start in {mode}")
+        for worker in workers:
+            worker.stdin.write("go\n")
+            worker.stdin.flush()
+
+        results = []
+        for worker in workers:
+            out, _ = worker.communicate()
+            if worker.returncode:
+                raise CommandError(f"A worker failed in {mode}")
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+        usernames = [result["user"] for result in results]
+        counter = subprocess.run(
+            [sys.executable, sys.argv[0], "bench_db_writes", "--count-users", *usernames],
+            env=env, capture_output=True, text=True,
+        )
+        rows = json.loads(counter.stdout)
+
+        latencies = sorted(l for result in results for l in result["latencies"])
+        errors = sum(c["error"] for result in results for c in result["counts"].values())
+        total_rows = sum(rows.values())
+        p50 = latencies[len(latencies) // 2] * 1e3 if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e3 if latencies else 0.0
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode}: {n_workers} workers x {seconds:g}s, {len(latencies)} requests, "
+            f"{errors} errors"
+        ))
+        self.stdout.write(
+            f"  rows written {total_rows} ({total_rows / seconds:.1f}/s): "
+            + ", ".join(f"{view} {rows[view]}" for view in VIEWS)
+        )
+        self.stdout.write(f"  latency p50 {p50:.1f}ms, p99 {p99:.1f}ms")
+
+        if mode == "env":
+            from django.contrib.auth.models import User
+
+            User.objects.filter(username__in=usernames).delete()
@@ -0,0 +1,86 @@
+import glob
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from farming.disease.predictor import FEATURE_NAMES, extract_features, load_image_array
+
+
+def reference_features(img_array):
+    """The original float64, multi-pass feature extraction, kept for comparison."""
+    img_array = img_array.astype(float)
+
+    r = img_array[:, :, 0]
+    g = img_array[:, :, 1]
+    b = img_array[:, :, 2]
+
+    r_mean, g_mean, b_mean = r.mean(), g.mean(), b.mean()
+    r_std, g_std, b_std = r.std(), g.std(), b.std()
+
+    edges_h = np.abs(np.diff(r, axis=1)).sum()
+    edges_v = np.abs(np.diff(r, axis=0)).sum()
+
+    spot_pixels = (
+        (np.abs(r - r_mean) > 40) |
+        (np.abs(g - g_mean) > 40) |
+        (np.abs(b - b_mean) > 40)
+    ).sum()
+
+    return np.array([
+        r_mean, g_mean, b_mean,
+        r_std, g_std, b_std,
+        (r_mean + g_mean + b_mean) / 3,
+        g_mean - (r_mean + b_mean) / 2,
+        r_mean - b_mean,
+        (r_mean + g_mean) / 2 - b_mean,
+        (edges_h + edges_v) / 1_000_000,
+        spot_pixels / (224 * 224),
+    ])
+
+
+def _best_of(func, arrays, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for array in arrays:
+            func(array)
+        best = min(best, time.perf_counter() - start)
+    return best / len(arrays)
+
+
+class Command(BaseCommand):
+    help = "Benchmark disease feature extraction against the original implementation"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--images", default=os.path.join(settings.MEDIA_ROOT, "disease_images"),
+            help="Directory of sample leaf images",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        paths = sorted(glob.glob(os.path.join(options["images"], "*.jpg")))
+        if not paths:
+            raise CommandError(f"No .jpg images in {options['images']}")
+
+        arrays = [load_image_array(path) for path in paths]
+        # The original worked on interleaved (224, 224, 3) arrays
+        interleaved = [np.ascontiguousarray(np.moveaxis(a, 0, 2)) for a in arrays]
+
+        for path, array, hwc in zip(paths, arrays, interleaved):
+            expected = reference_features(hwc)
+            actual = extract_features(array)
+            if not np.allclose(actual, expected, rtol=1e-12, atol=1e-9):
+                worst = FEATURE_NAMES[int(np.argmax(np.abs(actual - expected)))]
+                raise CommandError(f"{os.path.basename(path)}: {worst} differs")
+
+        old = _best_of(reference_features, interleaved, options["repeat"])
+        new = _best_of(extract_features, arrays, options["repeat"])
+
+        self.stdout.write(f"{len(arrays)} images, features match")
+        self.stdout.write(f"reference: {old * 1e3:.3f} ms/image")
+        self.stdout.write(f"fused:     {new * 1e3:.3f} ms/image")
+        self.stdout.write(self.style.SUCCESS(f"speedup:   {old / new:.2f}x"))
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from farming.ml import forecasting
+from farming.ml.market_predict import CROP_MARKET_DATA, market_today, predict_prices_many
+from farming.ml.price_store import get_price_store
+
+
+def synthetic_history(crop, days, seed=0):
+    """Daily prices shaped like CROP_MARKET_DATA, ending yesterday."""
+    data = CROP_MARKET_DATA[crop]
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(market_today(), "D")
+    dates = end - np.arange(days, 0, -1)
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12
+    drift = {"Increasing": 0.0002, "Decreasing": -0.0002}.get(data["trend"], 0.0)
+    prices = (
+        data["base_price"]
+        * np.array(data["seasonality"])[months]
+        * (1 + drift * np.arange(days))
+        * (1 + rng.normal(0, 0.03, days))
+    )
+    return dates, prices
+
+
+def _timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = "Benchmark market model fitting and forecasting latency across all crops"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=3 * 365, help="Synthetic history length")
+        parser.add_argument("--new-days", type=int, default=7, help="Days rolled in incrementally")
+        parser.add_argument("--horizon", type=int, default=30)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--store", action="store_true",
+            help="Fit the imported price store instead of synthetic series",
+        )
+
+    def handle(self, *args, **options):
+        store = get_price_store() if options["store"] else None
+        crops = store.crops() if store else list(CROP_MARKET_DATA)
+        repeat, new_days = options["repeat"], options["new_days"]
+
+        totals = {"full fit": 0.0, "incremental": 0.0, "forecast": 0.0}
+        self.stdout.write(f"{'crop':<12}{'days':>7}{'full fit':>12}{'incremental':>14}{'forecast':>12}")
+
+        for i, crop in enumerate(crops):
+            if store:
+                dates, prices = store.daily_means(crop)
+            else:
+                dates, prices = synthetic_history(crop, options["days"], seed=i)
+            if len(dates) <= max(forecasting.MIN_HISTORY_DAYS, new_days):
+                self.stdout.write(f"{crop:<12}{len(dates):>7}  not enough history")
+                continue
+
+            head = slice(None, -new_days)
+            full, state = _timed(lambda: forecasting.fit_series(dates[head], prices[head]), repeat)
+            incremental, state = _timed(
+                lambda: forecasting.update_series(state, dates[-new_days:], prices[-new_days:]), repeat
+            )
+            forecast, _ = _timed(
+                lambda: forecasting.forecast(state, market_today(), options["horizon"]), repeat
+            )
+
+            totals["full fit"] += full
+            totals["incremental"] += incremental
+            totals["forecast"] += forecast
+            self.stdout.write(
+                f"{crop:<12}{len(dates):>7}{full * 1e3:>10.2f}ms{incremental * 1e3:>12.3f}ms"
+                f"{forecast * 1e3:>10.3f}ms"
+            )
+
+        end_to_end, _ = _timed(
+            lambda: predict_prices_many(list(CROP_MARKET_DATA), options["horizon"], seeded=True),
+            repeat,
+        )
+        self.stdout.write(
+            f"{'total':<12}{'':>7}{totals['full fit'] * 1e3:>10.2f}ms"
+            f"{totals['incremental'] * 1e3:>12.3f}ms{totals['forecast'] * 1e3:>10.3f}ms"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"predict_prices_many, all {len(CROP_MARKET_DATA)} crops x {options['horizon']} days: "
+            f"{end_to_end * 1e3:.2f}ms"
+        ))
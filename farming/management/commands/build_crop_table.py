@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from farming.ml import crop_table
+
+
+class Command(BaseCommand):
+    help = "Precompute crop recommendations for every soil-input combination"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            table = crop_table.load_table(rebuild=True)
+        except FileNotFoundError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {len(table)} entries in {elapsed:.2f}s -> {crop_table.TABLE_PATH}"
+        ))
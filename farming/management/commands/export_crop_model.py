@@ -0,0 +1,41 @@
+import pickle
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from farming.ml.crop_predict import ARRAYS_DIR, MODEL_PATH
+from farming.ml.train_crop_model import (
+    export_forest_arrays,
+    verification_inputs,
+    verify_forest_arrays,
+)
+
+
+class Command(BaseCommand):
+    help = "Export crop_model.pkl to memory-mappable arrays and verify them against sklearn"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=MODEL_PATH, help="Pickled RandomForest to export")
+        parser.add_argument("--output", default=ARRAYS_DIR, help="Directory for the .npy files")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["model"], "rb") as f:
+                model = pickle.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"{options['model']} not found")
+
+        start = time.perf_counter()
+        meta = export_forest_arrays(model, options["output"], source_path=options["model"])
+        X = verification_inputs(model)
+
+        try:
+            verify_forest_arrays(model, options["output"], X)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {meta['n_trees']} trees to {options['output']} in {elapsed:.2f}s; "
+            f"predict_proba identical on {len(X)} rows"
+        ))
@@ -0,0 +1,80 @@
+import os
+import time
+from collections import Counter
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from farming.ml.market_predict import get_all_crops
+from farming.ml.price_store import DEFAULT_DIR, PriceStore
+
+
+class Command(BaseCommand):
+    help = "Bulk import daily mandi prices from a CSV into the columnar price store"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+        parser.add_argument("--store", default=DEFAULT_DIR, help="Price store directory")
+        parser.add_argument("--chunksize", type=int, default=1_000_000, help="Rows read per chunk")
+        parser.add_argument("--crop-column", default="crop")
+        parser.add_argument("--market-column", default="market")
+        parser.add_argument("--date-column", default="date")
+        parser.add_argument("--price-column", default="price")
+        parser.add_argument(
+            "--date-format", default=None,
+            help="strptime format of the date column, e.g. %%d/%%m/%%Y (default: ISO)",
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options["csv_path"]):
+            raise CommandError(f"{options['csv_path']} not found")
+
+        source = {
+            options["crop_column"]: "crop",
+            options["market_column"]: "market",
+            options["date_column"]: "date",
+            options["price_column"]: "price",
+        }
+        dtypes = {
+            options["crop_column"]: str,
+            options["market_column"]: str,
+            options["date_column"]: str,
+            options["price_column"]: "float64",
+        }
+
+        store = PriceStore(options["store"])
+        start = time.perf_counter()
+        total = 0
+        # Forecasts need CROP_MARKET_DATA (demand, yield, fallback prices)
+        known_crops = set(get_all_crops())
+        skipped = Counter()
+
+        try:
+            reader = pd.read_csv(
+                options["csv_path"],
+                usecols=list(source),
+                dtype=dtypes,
+                chunksize=options["chunksize"],
+            )
+            for chunk in reader:
+                chunk = chunk.rename(columns=source).dropna()
+                chunk["date"] = pd.to_datetime(chunk["date"], format=options["date_format"])
+                known = chunk["crop"].isin(known_crops)
+                skipped.update(chunk.loc[~known, "crop"].value_counts().to_dict())
+                total += store.write(chunk[known])
+                self.stdout.write(f"{total} rows imported")
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if skipped:
+            self.stderr.write(self.style.WARNING(
+                f"Skipped {sum(skipped.values())} rows for crops the market forecast does not "
+                f"know (add them to CROP_MARKET_DATA first): "
+                + ", ".join(f"{crop} ({rows})" for crop, rows in skipped.most_common())
+            ))
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} rows for {len(store.crops())} crops in {elapsed:.1f}s "
+            f"(store version {store.version})"
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from farming.ml.market_predict import get_all_crops
+from farming.ml.market_snapshots import materialize
+
+
+class Command(BaseCommand):
+    help = "Store today's market forecast and insights for every crop as snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--crops", nargs="+", help="Only these crops (default: all)")
+        parser.add_argument("--days", type=int, default=30, help="Forecast horizon")
+        parser.add_argument(
+            "--keep-old", action="store_true", help="Do not delete snapshots from earlier days"
+        )
+
+    def handle(self, *args, **options):
+        crops = options["crops"]
+        if crops:
+            unknown = sorted(set(crops) - set(get_all_crops()))
+            if unknown:
+                raise CommandError(f"Unknown crops: {', '.join(unknown)}")
+
+        written = materialize(crops, days_ahead=options["days"], prune=not options["keep_old"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} market snapshots"))
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _worker_main(batch_size, poll_seconds, once):
+    # Spawned: DJANGO_SETTINGS_MODULE is inherited, the app registry is not,
+    # so nothing here may import models before django.setup()
+    import django
+
+    django.setup()
+    from farming.disease.jobs import run_worker
+
+    try:
+        run_worker(batch_size, poll_seconds, once)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = "Process queued disease uploads in batches, one worker process per core"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes", type=int, default=os.cpu_count() or 1,
+            help="Worker processes (default: one per core)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="Jobs claimed at a time per process (default: DISEASE_JOB_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--poll", type=float,
+            help="Seconds to wait when the queue is empty (default: DISEASE_JOB_POLL_SECONDS)",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"] or settings.DISEASE_JOB_BATCH_SIZE
+        poll_seconds = options["poll"] if options["poll"] is not None else settings.DISEASE_JOB_POLL_SECONDS
+        once = options["once"]
+        processes = max(1, options["processes"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Disease workers: {processes} processes, batches of {batch_size}"
+        ))
+
+        if processes == 1:
+            from farming.disease.jobs import run_worker
+
+            try:
+                processed = run_worker(batch_size, poll_seconds, once)
+            except KeyboardInterrupt:
+                return
+            self.stdout.write(f"Processed {processed} jobs")
+            return
+
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=_worker_main, args=(batch_size, poll_seconds, once))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            return
+
+        failed = sum(1 for worker in workers if worker.exitcode)
+        if failed:
+            raise CommandError(f"{failed} of {processes} worker processes failed")
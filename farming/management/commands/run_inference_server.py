@@ -0,0 +1,43 @@
+import signal
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from farming.inference_service import serve
+
+
+class Command(BaseCommand):
+    help = "Serve crop and disease predictions to the web workers with micro-batching"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", help="Unix socket path (default: INFERENCE_SERVER_SOCKET)")
+        parser.add_argument(
+            "--max-batch", type=int,
+            help="Most requests per batch (default: INFERENCE_SERVER_MAX_BATCH)",
+        )
+        parser.add_argument(
+            "--max-wait-ms", type=float,
+            help="Longest wait for a batch to fill (default: INFERENCE_SERVER_MAX_WAIT_MS)",
+        )
+
+    def handle(self, *args, **options):
+        # Leave through the finally blocks so the socket file is removed
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+        socket_path = options["socket"] or settings.INFERENCE_SERVER_SOCKET
+        max_batch = options["max_batch"] or settings.INFERENCE_SERVER_MAX_BATCH
+        max_wait_ms = options["max_wait_ms"]
+        if max_wait_ms is None:
+            max_wait_ms = settings.INFERENCE_SERVER_MAX_WAIT_MS
+
+        def ready(batchers):
+            self.stdout.write(self.style.SUCCESS(
+                f"Inference server on {socket_path} "
+                f"(max batch {max_batch}, max wait {max_wait_ms:g}ms)"
+            ))
+
+        try:
+            serve(socket_path, max_batch, max_wait_ms, ready=ready)
+        except KeyboardInterrupt:
+            pass
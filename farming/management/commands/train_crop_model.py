@@ -0,0 +1,56 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from farming.ml.crop_predict import ARRAYS_DIR, MODEL_PATH
+from farming.ml.train_crop_model import (
+    export_forest_arrays,
+    save_model,
+    train_streaming,
+    verification_inputs,
+    verify_forest_arrays,
+)
+
+
+class Command(BaseCommand):
+    help = "Train the crop recommendation model from a CSV, streaming it in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", help="CSV with N,P,K,temperature,humidity,ph,rainfall,label columns")
+        parser.add_argument("--output", default=MODEL_PATH, help="Where to write the pickled model")
+        parser.add_argument("--chunksize", type=int, default=500_000, help="Rows read per chunk")
+        parser.add_argument("--n-estimators", type=int, default=100, help="Total trees in the forest")
+        parser.add_argument("--n-jobs", type=int, default=-1, help="Cores used for fitting (-1 = all)")
+        parser.add_argument("--random-state", type=int, default=42)
+        parser.add_argument(
+            "--no-export", action="store_true",
+            help="Skip writing the memory-mapped crop_model_arrays/ copy",
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options["csv_path"]):
+            raise CommandError(f"{options['csv_path']} not found")
+
+        try:
+            model, meta = train_streaming(
+                options["csv_path"],
+                chunksize=options["chunksize"],
+                n_estimators=options["n_estimators"],
+                n_jobs=options["n_jobs"],
+                random_state=options["random_state"],
+                log=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        sidecar = save_model(model, meta, options["output"])
+        self.stdout.write(f"Saved {options['output']} (metadata in {sidecar})")
+
+        if not options["no_export"] and options["output"] == MODEL_PATH:
+            export_forest_arrays(model, ARRAYS_DIR, source_path=MODEL_PATH)
+            verify_forest_arrays(model, ARRAYS_DIR, verification_inputs(model))
+            self.stdout.write(f"Exported {ARRAYS_DIR}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Crop model trained on {meta['n_rows']} rows in {meta['training_seconds']}s"
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farming', '0007_remove_croprecommendation_confidence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('crop', models.CharField(max_length=100)),
+                ('days_ahead', models.PositiveSmallIntegerField(default=30)),
+                ('data_version', models.CharField(max_length=32)),
+                ('forecast', models.JSONField()),
+                ('insights', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'crop', 'days_ahead', 'data_version'), name='market_snapshot_unique_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farming', '0008_marketsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketprice',
+            name='data_version',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='marketprice',
+            name='days_ahead',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+        migrations.AddField(
+            model_name='marketprice',
+            name='forecast_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketprice',
+            name='max_price',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketprice',
+            name='min_price',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketprice',
+            name='trend',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='marketprice',
+            name='location',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-18 06:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farming', '0009_marketprice_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='croprecommendation',
+            index=models.Index(fields=['user', '-created_at'], name='croprec_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diseasedetection',
+            index=models.Index(fields=['user', '-created_at'], name='disease_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketprice',
+            index=models.Index(fields=['user', '-created_at'], name='market_user_created_idx'),
+        ),
+    ]
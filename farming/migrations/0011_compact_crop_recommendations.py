@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.db import migrations
+
+# Rows saved by one crop_recommend request share their inputs and were
+# inserted back to back; anything further apart is a separate request.
+SAME_REQUEST = timedelta(seconds=5)
+INPUT_FIELDS = (
+    "user_id", "fertility", "soil_type", "climate", "rainfall_level",
+    "rainfall", "temperature", "humidity", "ph",
+)
+
+
+def compact(apps, schema_editor):
+    """Fold each request's per-crop rows into its first row's recommended_crops."""
+    CropRecommendation = apps.get_model("farming", "CropRecommendation")
+    rows = (
+        CropRecommendation.objects
+        .order_by("user_id", "id")
+        .only("id", "created_at", "recommended_crop", "recommended_crops", *INPUT_FIELDS)
+        .iterator(chunk_size=2000)
+    )
+
+    updates, delete_ids = [], []
+    group = None
+    for row in rows:
+        key = tuple(getattr(row, field) for field in INPUT_FIELDS)
+        if (
+            group is not None
+            and not row.recommended_crops
+            and key == group["key"]
+            and row.created_at - group["last"] <= SAME_REQUEST
+            and row.recommended_crop not in group["head"].recommended_crops
+        ):
+            group["head"].recommended_crops.append(row.recommended_crop)
+            group["last"] = row.created_at
+            group["changed"] = True
+            delete_ids.append(row.id)
+            continue
+
+        if group is not None and group["changed"]:
+            updates.append(group["head"])
+        if row.recommended_crops:
+            group = None  # already stored grouped
+        else:
+            row.recommended_crops = [row.recommended_crop]
+            group = {"key": key, "head": row, "last": row.created_at, "changed": True}
+
+    if group is not None and group["changed"]:
+        updates.append(group["head"])
+
+    CropRecommendation.objects.bulk_update(updates, ["recommended_crops"], batch_size=500)
+    for start in range(0, len(delete_ids), 500):
+        CropRecommendation.objects.filter(id__in=delete_ids[start:start + 500]).delete()
+
+
+def expand(apps, schema_editor):
+    """Back to one row per recommended crop."""
+    CropRecommendation = apps.get_model("farming", "CropRecommendation")
+    new_rows, created = [], []
+    for row in CropRecommendation.objects.exclude(recommended_crops=[]).iterator(chunk_size=2000):
+        for crop in row.recommended_crops[1:]:
+            new_rows.append(CropRecommendation(
+                **{field: getattr(row, field) for field in INPUT_FIELDS},
+                recommended_crop=crop,
+            ))
+            created.append(row.created_at)
+    CropRecommendation.objects.bulk_create(new_rows, batch_size=500)
+
+    # auto_now_add stamped the new rows with the current time
+    for row, created_at in zip(new_rows, created):
+        row.created_at = created_at
+    CropRecommendation.objects.bulk_update(new_rows, ["created_at"], batch_size=500)
+    CropRecommendation.objects.update(recommended_crops=[])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farming', '0010_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact, expand),
+    ]
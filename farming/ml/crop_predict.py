@@ -1,22 +1,150 @@
 
+import functools
+import hashlib
+import json
 import pickle
 import os
 import numpy as np
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "crop_model.pkl")
+ARRAYS_DIR = os.path.join(BASE_DIR, "crop_model_arrays")
+ARRAYS_META = "meta.json"
 
 _model = None  # lazy-loaded model
 
 
+class ForestArrays:
+    """
+    RandomForestClassifier flattened into memory-mapped NumPy arrays.
+
+    Written by train_crop_model.export_forest_arrays. All trees share one
+    node table; leaves point to themselves so every tree can be walked in
+    lock-step for max_depth steps. predict_proba matches sklearn's exactly.
+    """
+
+    def __init__(self, directory=ARRAYS_DIR):
+        with open(os.path.join(directory, ARRAYS_META)) as f:
+            self.meta = json.load(f)
+
+        def _load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        self.roots = _load("roots")
+        self.feature = _load("feature")
+        self.threshold = _load("threshold")
+        self.children_left = _load("children_left")
+        self.children_right = _load("children_right")
+        self.value = _load("value")
+        self.classes_ = np.array(self.meta["classes"])
+        self.n_features_in_ = self.meta["n_features"]
+        self.max_depth = self.meta["max_depth"]
+
+    def apply(self, X):
+        """Leaf node index of every sample in every tree, (n_trees, n_samples)."""
+        # Trees split on float32 features, same as sklearn
+        X = np.asarray(X, dtype=np.float32)
+        samples = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+
+        for _ in range(self.max_depth):
+            go_left = X[samples, self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = np.where(
+                go_left, self.children_left[nodes], self.children_right[nodes]
+            )
+            # Every sample has reached a leaf in every tree
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+
+        # Accumulate tree by tree in order, as sklearn does
+        proba = np.zeros((leaves.shape[1], len(self.classes_)), dtype=np.float64)
+        for tree_leaves in leaves:
+            proba += self.value[tree_leaves]
+        proba /= len(self.roots)
+
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+@functools.lru_cache(maxsize=8)
+def _sha256(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    """SHA-256 of a file, computed once per (size, mtime) in each process."""
+    stat = os.stat(path)
+    return _sha256(path, stat.st_size, stat.st_mtime_ns)
+
+
+def _arrays_meta():
+    try:
+        with open(os.path.join(ARRAYS_DIR, ARRAYS_META)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def model_file():
+    """
+    The file load_model() reads the model from.
+
+    Exported arrays win only while they were built from the current
+    crop_model.pkl (or there is no pickle), so a retrain without an export
+    is picked up instead of being hidden by stale arrays.
+    """
+    meta = _arrays_meta()
+    if meta is None:
+        return MODEL_PATH
+    if os.path.exists(MODEL_PATH) and meta.get("source_hash") != file_sha256(MODEL_PATH):
+        return MODEL_PATH
+    return os.path.join(ARRAYS_DIR, ARRAYS_META)
+
+
+def model_hash():
+    """Content hash of the model load_model() serves, for keying derived data."""
+    path = model_file()
+    if path == MODEL_PATH:
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError("crop_model.pkl not found")
+        return file_sha256(MODEL_PATH)
+
+    source_hash = _arrays_meta().get("source_hash")
+    if source_hash:
+        return source_hash
+
+    # Arrays exported before source hashes were recorded: hash their contents
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(ARRAYS_DIR)):
+        digest.update(name.encode())
+        digest.update(file_sha256(os.path.join(ARRAYS_DIR, name)).encode())
+    return digest.hexdigest()
+
+
 def load_model():
     global _model
     if _model is None:
-        if not os.path.exists(MODEL_PATH):
+        path = model_file()
+        if not os.path.exists(path):
             raise FileNotFoundError("crop_model.pkl not found")
 
-        with open(MODEL_PATH, "rb") as f:
-            _model = pickle.load(f)
+        if path != MODEL_PATH:
+            _model = ForestArrays(ARRAYS_DIR)
+        else:
+            with open(MODEL_PATH, "rb") as f:
+                _model = pickle.load(f)
 
     return _model
 
@@ -27,14 +155,37 @@ def predict_crops(features, top_k=3):
 
     features: list or array of input features
     top_k: number of crops to recommend
+
+    Batched by the inference server when one is running.
     """
+    from farming import inference_service
+
+    try:
+        return inference_service.call("crop", (features, top_k))
+    except inference_service.Unavailable:
+        return predict_crops_batch([features], top_k=top_k)[0]
 
-    model = load_model()
+
+def predict_crops_batch(features_2d, top_k=3):
+    """
+    Predict top K suitable crops for many feature rows at once.
+
+    features_2d: 2D list or array, one row of input features per plot
+    top_k: number of crops to recommend per row
+
+    Returns one result list per input row, in the same order.
+    """
 
     # Convert to numpy array
-    X = np.array(features).reshape(1, -1)
+    X = np.asarray(features_2d, dtype=float)
+    if X.size == 0:
+        return []
+    if X.ndim != 2:
+        raise ValueError(f"Expected a 2D feature matrix, got {X.ndim}D")
 
-    # Validate feature count
+    model = load_model()
+
+    # Validate feature count once for the whole matrix
     if hasattr(model, "n_features_in_"):
         if X.shape[1] != model.n_features_in_:
             raise ValueError(
@@ -43,23 +194,35 @@ def predict_crops(features, top_k=3):
 
     # If model supports probabilities (best case)
     if hasattr(model, "predict_proba"):
-        probs = model.predict_proba(X)[0]
+        probs = model.predict_proba(X)
         class_labels = model.classes_
+        k = max(1, min(top_k, probs.shape[1]))
+
+        # k-th largest probability per row via a partial partition
+        kth = np.partition(probs, -k, axis=1)[:, -k][:, None]
 
-        top_indices = np.argsort(probs)[-top_k:][::-1]
+        # Keep everything above it, then fill with the lowest-index ties
+        # so the selection is deterministic (and prefix-stable across k)
+        above = probs > kth
+        ties = probs == kth
+        needed = k - above.sum(axis=1, keepdims=True)
+        selected = above | (ties & (np.cumsum(ties, axis=1) <= needed))
+        top = np.nonzero(selected)[1].reshape(len(probs), k)
+
+        # Sort just those k columns: highest probability first, ties by class order
+        order = np.argsort(
+            -np.take_along_axis(probs, top, axis=1), axis=1, kind="stable"
+        )
+        top_indices = np.take_along_axis(top, order, axis=1)
 
         results = [
-            {
-                "crop": class_labels[i],
-                
-            }
-            for i in top_indices
+            [{"crop": class_labels[i]} for i in row]
+            for row in top_indices
         ]
 
     else:
         # Fallback for models without probabilities
-        prediction = model.predict(X)[0]
-        results = [{"crop": prediction.title()}]
+        predictions = model.predict(X)
+        results = [[{"crop": prediction.title()}] for prediction in predictions]
 
     return results
-
@@ -0,0 +1,98 @@
+import itertools
+import json
+import os
+
+from farming.ml.crop_predict import model_hash, predict_crops, predict_crops_batch
+from farming.ml.soil_mapper import SOIL_INPUT_CHOICES, map_soil_inputs
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_PATH = os.path.join(BASE_DIR, "crop_table.json")
+TABLE_TOP_K = 5
+
+_table = None  # lazy-loaded {(fertility, soil_type, climate, rainfall): [crop, ...]}
+
+
+def build_table(top_k=TABLE_TOP_K):
+    """
+    Score every soil-input combination with one batched model call.
+
+    Returns {(fertility, soil_type, climate, rainfall): [crop, ...]}.
+    """
+    combos = list(itertools.product(*SOIL_INPUT_CHOICES))
+    features = [map_soil_inputs(*combo) for combo in combos]
+    results = predict_crops_batch(features, top_k=top_k)
+
+    return {
+        combo: [str(r["crop"]) for r in crops]
+        for combo, crops in zip(combos, results)
+    }
+
+
+def save_table(table, model_hash, path=TABLE_PATH):
+    """Write the table to disk atomically, tagged with the model hash."""
+    payload = {
+        "model_hash": model_hash,
+        "table": {"|".join(combo): crops for combo, crops in table.items()},
+    }
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def read_table(model_hash, path=TABLE_PATH):
+    """Return the stored table, or None if missing or built for another model."""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if payload.get("model_hash") != model_hash:
+        return None
+
+    return {
+        tuple(key.split("|")): crops
+        for key, crops in payload["table"].items()
+    }
+
+
+def load_table(rebuild=False):
+    """
+    Load the lookup table for the current crop_model.pkl.
+
+    The stored table is reused only if it was built from a model file with
+    the same hash; otherwise it is rebuilt and saved.
+    """
+    global _table
+    if _table is None or rebuild:
+        current_hash = model_hash()
+        table = None if rebuild else read_table(current_hash)
+
+        if table is None:
+            table = build_table()
+            save_table(table, current_hash)
+
+        _table = table
+
+    return _table
+
+
+def lookup_crops(fertility, soil_type, climate, rainfall, top_k=3):
+    """
+    Same result shape as predict_crops, answered from the precomputed table.
+
+    Falls back to the model for requests the table cannot answer.
+    """
+    key = (fertility, soil_type, climate, rainfall)
+    crops = load_table().get(key)
+
+    if crops is None or top_k > len(crops):
+        features = map_soil_inputs(fertility, soil_type, climate, rainfall)
+        return predict_crops(features, top_k=top_k)
+
+    return [{"crop": crop} for crop in crops[:top_k]]
@@ -0,0 +1,246 @@
+"""
+Statistical price forecasting: seasonal decomposition + Holt smoothing.
+
+Daily mean prices are put on a gap-free daily grid, split into calendar
+month seasonal factors (ratio to a centred 365-day moving average) and a
+deseasonalised series, which is fitted with Holt's linear exponential
+smoothing. Holt's method is ARIMA(0,2,2), so its one-step errors are a
+single scipy.signal.lfilter over the second differences and the smoothing
+constants are fitted by minimising that SSE.
+
+Fits are cached per crop (in memory and as JSON next to the price store)
+and rolled forward over newly imported days without re-optimising; a full
+refit happens after REFIT_AFTER_DAYS new days or when older months change.
+"""
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+from scipy.optimize import minimize
+from scipy.signal import lfilter
+
+MIN_HISTORY_DAYS = 60      # days with prices needed before a crop is fitted
+HISTORY_YEARS = 3          # history used by a full fit
+SEASON_WINDOW = 365        # centred moving average window for the trend
+REFIT_AFTER_DAYS = 90      # incremental days before the next full fit
+FITS_DIR = "fits"          # under the price store root
+
+_fits = {}  # crop -> fit state
+
+
+# ---------- fitting ----------
+
+def daily_grid(dates, prices):
+    """Linearly interpolate (dates, prices) onto every day of their range."""
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    grid = np.arange(days[0], days[-1] + 1)
+    return grid.astype("datetime64[D]"), np.interp(grid, days, prices)
+
+
+def _calendar_months(dates):
+    return dates.astype("datetime64[M]").astype(np.int64) % 12
+
+
+def seasonal_factors(dates, prices, fallback=None):
+    """
+    Multiplicative calendar-month factors with mean 1.
+
+    Uses the ratio to a centred SEASON_WINDOW moving average when there is
+    enough data, else the ratio to the overall mean. Months without data
+    take the fallback factor (1.0 by default).
+    """
+    months = _calendar_months(dates)
+
+    if len(prices) > SEASON_WINDOW:
+        half = SEASON_WINDOW // 2
+        moving = np.convolve(prices, np.ones(SEASON_WINDOW) / SEASON_WINDOW, mode="valid")
+        ratios = prices[half:half + len(moving)] / moving
+        months = months[half:half + len(moving)]
+    else:
+        ratios = prices / prices.mean()
+
+    counts = np.bincount(months, minlength=12)
+    sums = np.bincount(months, weights=ratios, minlength=12)
+    fallback = np.ones(12) if fallback is None else np.asarray(fallback, dtype=float)
+    factors = np.where(counts > 0, sums / np.maximum(counts, 1), fallback)
+
+    return factors / factors.mean()
+
+
+def holt_errors(y, alpha, beta):
+    """One-step-ahead errors of Holt's method for y[2:] (level/trend seeded from y[:2])."""
+    theta1 = 2 - alpha - alpha * beta
+    theta2 = alpha - 1
+    second_diff = y[2:] - 2 * y[1:-1] + y[:-2]
+    return lfilter([1.0], [1.0, -theta1, -theta2], second_diff)
+
+
+def holt_state(y, alpha, beta, errors):
+    """Final (level, trend) after running Holt's method over y."""
+    level = y[-1] - (1 - alpha) * errors[-1]
+    trend = (y[1] - y[0]) + alpha * beta * errors.sum()
+    return level, trend
+
+
+def fit_holt(y):
+    """Least-squares smoothing constants for y -> (alpha, beta, level, trend, sse)."""
+    def sse(params):
+        return float(np.square(holt_errors(y, *params)).sum())
+
+    best = minimize(sse, x0=[0.3, 0.05], method="L-BFGS-B", bounds=[(1e-3, 1.0), (1e-3, 1.0)])
+    alpha, beta = best.x
+    errors = holt_errors(y, alpha, beta)
+    level, trend = holt_state(y, alpha, beta, errors)
+    return float(alpha), float(beta), float(level), float(trend), float(best.fun)
+
+
+def fit_series(dates, prices, fallback_seasonality=None):
+    """
+    Full fit of one crop's daily mean prices. Returns a JSON-serialisable
+    state, or None with fewer than MIN_HISTORY_DAYS days of data.
+    """
+    if len(dates) < MIN_HISTORY_DAYS:
+        return None
+
+    grid, values = daily_grid(dates, prices)
+    seasonality = seasonal_factors(grid, values, fallback_seasonality)
+    y = values / seasonality[_calendar_months(grid)]
+    alpha, beta, level, trend, sse = fit_holt(y)
+
+    return {
+        "alpha": alpha,
+        "beta": beta,
+        "level": level,
+        "trend": trend,
+        "seasonality": seasonality.tolist(),
+        "last_date": str(grid[-1]),
+        "last_price": float(values[-1]),
+        "fitted_through": str(grid[-1]),
+        "n_days": int(len(grid)),
+        "sse": sse,
+    }
+
+
+def update_series(state, dates, prices):
+    """
+    Roll a fitted state forward over days after state["last_date"] with the
+    same smoothing constants and seasonal factors (no re-optimisation).
+    """
+    last = np.datetime64(state["last_date"], "D")
+    keep = dates > last
+    if not keep.any():
+        return state
+
+    # Bridge from the last fitted day so gaps are interpolated as in a full fit
+    grid, values = daily_grid(
+        np.concatenate([[last], dates[keep]]),
+        np.concatenate([[state["last_price"]], prices[keep]]),
+    )
+    grid, values = grid[1:], values[1:]
+
+    seasonality = np.array(state["seasonality"])
+    y = values / seasonality[_calendar_months(grid)]
+    alpha, beta = state["alpha"], state["beta"]
+    level, trend = state["level"], state["trend"]
+
+    for value in y:
+        previous = level
+        level = alpha * value + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+
+    return {
+        **state,
+        "level": float(level),
+        "trend": float(trend),
+        "last_date": str(grid[-1]),
+        "last_price": float(values[-1]),
+        "n_days": state["n_days"] + int(len(grid)),
+    }
+
+
+def forecast(state, start, days_ahead):
+    """Deseasonalised Holt forecast times the month factor for each day from start."""
+    dates = np.datetime64(start, "D") + np.arange(days_ahead)
+    horizon = (dates - np.datetime64(state["last_date"], "D")).astype(np.int64)
+    seasonality = np.array(state["seasonality"])
+    return dates, (state["level"] + horizon * state["trend"]) * seasonality[_calendar_months(dates)]
+
+
+# ---------- per-crop cache over the price store ----------
+
+def _fit_path(store, crop):
+    return os.path.join(store.root, FITS_DIR, f"{crop}.json")
+
+
+def _load_saved(store, crop):
+    try:
+        with open(_fit_path(store, crop)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(store, crop, state):
+    path = _fit_path(store, crop)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _needs_full_fit(state, months):
+    if state is None or state.get("fit") is None:
+        return True
+
+    fit = state["fit"]
+    fitted_through = date.fromisoformat(fit["fitted_through"])
+    if date.fromisoformat(fit["last_date"]) - fitted_through > timedelta(days=REFIT_AFTER_DAYS):
+        return True
+
+    # Rows added to or replaced in months before the last fitted one
+    # (months maps each month to its content checksum)
+    last_month = fit["last_date"][:7]
+    return any(
+        months.get(month) != state["months"].get(month)
+        for month in set(months) | set(state["months"])
+        if month < last_month
+    )
+
+
+def get_fit(crop, store, fallback_seasonality=None):
+    """
+    Current fit state for a crop in the store (None without enough history).
+
+    Reuses the cached fit while the store version is unchanged, rolls it
+    forward over new days when only later rows arrived, and refits from
+    scratch otherwise.
+    """
+    state = _fits.get(crop) or _load_saved(store, crop)
+    if state is not None and state["store_version"] == store.version:
+        _fits[crop] = state
+        return state["fit"]
+
+    months = store.month_checksums(crop)
+
+    if _needs_full_fit(state, months):
+        end = np.datetime64(max(months), "M") + 1 if months else None
+        start = (end - 12 * HISTORY_YEARS) if end is not None else None
+        dates, prices = store.daily_means(
+            crop,
+            start=start.astype("datetime64[D]") if start is not None else None,
+        )
+        fit = fit_series(dates, prices, fallback_seasonality)
+    else:
+        fit = state["fit"]
+        dates, prices = store.daily_means(
+            crop, start=np.datetime64(fit["last_date"], "D") + 1
+        )
+        if len(dates):
+            fit = update_series(fit, dates, prices)
+
+    state = {"fit": fit, "months": dict(months), "store_version": store.version}
+    _fits[crop] = state
+    _save(store, crop, state)
+    return fit
@@ -0,0 +1,60 @@
+"""
+Per-day cache in front of the market crop comparisons.
+
+Single-crop forecasts and insights come from MarketSnapshot rows
+(market_snapshots.py). Comparisons are seeded by (crop, date,
+MODEL_VERSION), so every request on the same day gets the same numbers;
+entries expire at the next midnight in MARKET_TZ, or as soon as new price
+history is imported. Uses Django's default cache backend.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+
+from farming.ml import market_predict
+
+
+def seconds_until_midnight(now=None):
+    """Seconds left until the next midnight in MARKET_TZ (at least 1)."""
+    now = now or datetime.now(market_predict.MARKET_TZ)
+    midnight = datetime.combine(
+        now.date() + timedelta(days=1), time(0), tzinfo=market_predict.MARKET_TZ
+    )
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def _cache_key(kind, crop, *parts):
+    today = market_predict.market_today().isoformat()
+    suffix = ':'.join(str(part) for part in parts)
+    return f'market:{market_predict.data_version()}:{today}:{kind}:{crop}:{suffix}'
+
+
+def _get_or_compute(key, compute):
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        if result is not None:
+            cache.set(key, result, seconds_until_midnight())
+    return result
+
+
+def get_comparison(crops, days_ahead=30):
+    """Cached compare_crops_forecast for today, keyed on the set of crops."""
+    crops = sorted(set(crops))
+    return _get_or_compute(
+        _cache_key('compare', ','.join(crops), days_ahead),
+        lambda: market_predict.compare_crops_forecast(crops, days_ahead, seeded=True),
+    )
+
+
+async def aget_comparison(crops, days_ahead=30):
+    """get_comparison for async views, computed in the inference pool on a miss."""
+    from farming.offload import run_cpu
+
+    crops = sorted(set(crops))
+    key = _cache_key('compare', ','.join(crops), days_ahead)
+    result = await cache.aget(key)
+    if result is None:
+        result = await run_cpu(market_predict.compare_crops_forecast, crops, days_ahead, None, True)
+        await cache.aset(key, result, seconds_until_midnight())
+    return result
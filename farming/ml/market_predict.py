@@ -1,6 +1,16 @@
+import hashlib
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
+from zoneinfo import ZoneInfo
+
+# Forecast days start at midnight in the markets' time zone
+MARKET_TZ = ZoneInfo('Asia/Kolkata')
+
+# Bump when CROP_MARKET_DATA or the forecast logic changes, so seeded
+# forecasts (and anything cached from them) change with it
+MODEL_VERSION = '1'
 
 # Sample market data for different crops
 CROP_MARKET_DATA = {
@@ -66,118 +76,345 @@ CROP_MARKET_DATA = {
     },
 }
 
-def predict_prices(crop, days_ahead=30):
+# Fractional price drift over the whole horizon for each trend label
+TREND_DRIFT = {
+    'Increasing': 0.05,
+    'Decreasing': -0.05,
+    'Stable': 0.0,
+}
+
+# Estimated yield per hectare (quintal), for simplified revenue figures
+ESTIMATED_YIELD_PER_HECTARE = {
+    'Rice': 50,
+    'Wheat': 45,
+    'Corn': 55,
+    'Maize': 55,
+    'Sugarcane': 70,
+    'Cotton': 20,
+    'Potato': 200,
+    'Tomato': 400,
+    'Onion': 250,
+    'Cabbage': 300,
+}
+
+# Insight text per demand level and per trend label
+DEMAND_INSIGHTS = {
+    'High': ('Very strong market', 'Good selling opportunity', 'Limited surplus risk'),
+    'Medium': ('Moderate market activity', 'Fair prices expected', 'Some price volatility'),
+    'Low': ('Weak demand', 'Buyer\'s market', 'Higher storage costs needed'),
+}
+
+TREND_INSIGHTS = {
+    'Increasing': 'Prices are expected to rise. Good time to plan production.',
+    'Decreasing': 'Prices are expected to fall. Consider market timing.',
+    'Stable': 'Prices are relatively stable. Consistent returns expected.',
+}
+
+# Column-wise copies of CROP_MARKET_DATA for the vectorised forecast
+_CROP_INDEX = {crop: i for i, crop in enumerate(CROP_MARKET_DATA)}
+_BASE_PRICES = np.array([d['base_price'] for d in CROP_MARKET_DATA.values()], dtype=float)
+_SEASONALITY = np.array([d['seasonality'] for d in CROP_MARKET_DATA.values()], dtype=float)
+_TREND_DRIFT = np.array([TREND_DRIFT[d['trend']] for d in CROP_MARKET_DATA.values()])
+
+# 30-day drift beyond which a history-derived trend is not 'Stable'
+TREND_THRESHOLD = 0.02
+
+_history_profiles = {'key': None, 'crops': {}}
+_insights_index = {'key': None, 'crops': None}
+
+
+def market_today():
+    """Today's date in MARKET_TZ."""
+    return datetime.now(MARKET_TZ).date()
+
+
+def data_version():
+    """MODEL_VERSION plus the price store version, for cache keys."""
+    from farming.ml.price_store import get_price_store
+
+    store = get_price_store()
+    return f'{MODEL_VERSION}.{store.version if store else 0}'
+
+
+def history_profile(crop, store, today):
+    """
+    Forecast parameters for a crop fitted on its price history.
+
+    Uses the seasonal decomposition + Holt smoothing fit from forecasting.py:
+    base_price is the fitted deseasonalised level projected to today and
+    daily_drift the fitted trend as a fraction of it. Returns None without
+    enough history.
+    """
+    from farming.ml import forecasting
+
+    key = (store.version, today)
+    if _history_profiles['key'] != key:
+        _history_profiles['key'] = key
+        _history_profiles['crops'] = {}
+    if crop in _history_profiles['crops']:
+        return _history_profiles['crops'][crop]
+
+    static = _SEASONALITY[_CROP_INDEX[crop]] if crop in _CROP_INDEX else None
+    fit = forecasting.get_fit(crop, store, fallback_seasonality=static)
+
+    profile = None
+    if fit is not None:
+        gap = (today - date.fromisoformat(fit['last_date'])).days
+        level = fit['level'] + gap * fit['trend']
+
+        if level > 0:
+            daily_drift = fit['trend'] / level
+            if daily_drift * 30 > TREND_THRESHOLD:
+                trend = 'Increasing'
+            elif daily_drift * 30 < -TREND_THRESHOLD:
+                trend = 'Decreasing'
+            else:
+                trend = 'Stable'
+
+            profile = {
+                'base_price': float(level),
+                'seasonality': np.array(fit['seasonality']),
+                'daily_drift': float(daily_drift),
+                'trend': trend,
+            }
+
+    _history_profiles['crops'][crop] = profile
+    return profile
+
+
+def market_profiles(crops, start):
+    """
+    Per-crop forecast parameters as arrays: base_price, seasonality (n, 12),
+    horizon_drift (fraction over the whole horizon, from the trend label),
+    daily_drift (fraction per day, from history) and the trend labels.
+    """
+    from farming.ml.price_store import get_price_store
+
+    rows = [_CROP_INDEX[crop] for crop in crops]
+    profiles = {
+        'base_price': _BASE_PRICES[rows],
+        'seasonality': _SEASONALITY[rows],
+        'horizon_drift': _TREND_DRIFT[rows],
+        'daily_drift': np.zeros(len(rows)),
+        'trend': [CROP_MARKET_DATA[crop]['trend'] for crop in crops],
+    }
+
+    store = get_price_store()
+    if store is not None:
+        for i, crop in enumerate(crops):
+            history = history_profile(crop, store, start)
+            if history is None:
+                continue
+            profiles['base_price'][i] = history['base_price']
+            profiles['seasonality'][i] = history['seasonality']
+            profiles['horizon_drift'][i] = 0.0
+            profiles['daily_drift'][i] = history['daily_drift']
+            profiles['trend'][i] = history['trend']
+
+    return profiles
+
+
+def forecast_seed(crop, start, version=MODEL_VERSION):
+    """Stable 64-bit seed for a (crop, forecast date, model version) triple."""
+    key = f'{crop}|{start.isoformat()}|{version}'.encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+def forecast_matrix(crops, days_ahead=30, start=None, seeded=False, profiles=None):
+    """
+    Forecast many crops over the whole horizon at once.
+
+    Returns (dates, prices): dates is a list of 'YYYY-MM-DD' strings and
+    prices a (len(crops), days_ahead) array rounded to 2 decimals. Unknown
+    crops raise KeyError.
+
+    With seeded=True each crop's fluctuations come from its own Generator
+    seeded by forecast_seed, so the same crop, start date and MODEL_VERSION
+    always give the same prices, whatever other crops are in the call.
+
+    Crops with enough imported price history are forecast from it (see
+    history_profile); the rest use CROP_MARKET_DATA.
+    """
+    if start is None:
+        start = market_today() if seeded else datetime.now().date()
+    if profiles is None:
+        profiles = market_profiles(crops, start)
+
+    days = np.arange(days_ahead)
+    months = (start.month - 1 + days // 30) % 12
+
+    if seeded:
+        noise = np.array([
+            np.random.default_rng(forecast_seed(crop, start)).random(days_ahead)
+            for crop in crops
+        ]).reshape(len(crops), days_ahead)
+    else:
+        noise = np.random.random((len(crops), days_ahead))
+
+    seasonality = profiles['seasonality'][:, months]
+    fluctuation = 1 + (noise - 0.5) * 0.1
+    trend_factor = (
+        1
+        + (days / days_ahead) * profiles['horizon_drift'][:, None]
+        + days * profiles['daily_drift'][:, None]
+    )
+
+    prices = np.round(
+        profiles['base_price'][:, None] * seasonality * fluctuation * trend_factor, 2
+    )
+    dates = (np.datetime64(start, 'D') + days).astype(str).tolist()
+
+    return dates, prices
+
+
+def predict_prices_many(crops, days_ahead=30, start=None, seeded=False):
+    """predict_prices for several crops from a single forecast_matrix call."""
+    crops = [crop for crop in crops if crop in CROP_MARKET_DATA]
+    if not crops:
+        return {}
+
+    if start is None:
+        start = market_today() if seeded else datetime.now().date()
+    profiles = market_profiles(crops, start)
+
+    dates, prices = forecast_matrix(
+        crops, days_ahead, start=start, seeded=seeded, profiles=profiles
+    )
+    avg = np.round(prices.mean(axis=1), 2)
+    low = prices.min(axis=1)
+    high = prices.max(axis=1)
+
+    return {
+        crop: {
+            'crop': crop,
+            'dates': dates,
+            'prices': prices[i].tolist(),
+            'avg_price': float(avg[i]),
+            'min_price': float(low[i]),
+            'max_price': float(high[i]),
+            'trend': profiles['trend'][i],
+        }
+        for i, crop in enumerate(crops)
+    }
+
+
+def predict_prices(crop, days_ahead=30, start=None, seeded=False):
     """Predict crop prices for the next N days"""
     if crop not in CROP_MARKET_DATA:
         return None
-    
-    data = CROP_MARKET_DATA[crop]
-    base_price = data['base_price']
-    current_month = datetime.now().month - 1  # 0-indexed
-    
-    prices = []
-    dates = []
-    
-    for day in range(days_ahead):
-        date = datetime.now() + timedelta(days=day)
-        month = (current_month + day // 30) % 12
-        
-        # Get seasonality factor
-        seasonality = data['seasonality'][month]
-        
-        # Add some random fluctuation
-        fluctuation = 1 + (np.random.random() - 0.5) * 0.1
-        
-        # Trend adjustment
-        if data['trend'] == 'Increasing':
-            trend_factor = 1 + (day / days_ahead) * 0.05
-        elif data['trend'] == 'Decreasing':
-            trend_factor = 1 - (day / days_ahead) * 0.05
+
+    return predict_prices_many([crop], days_ahead, start=start, seeded=seeded)[crop]
+
+def _build_insights_index(today):
+    """Insights for every crop, from market_profiles for today, behind a read-only mapping."""
+    crops = list(CROP_MARKET_DATA)
+    profiles = market_profiles(crops, today)
+
+    index = {}
+    for i, crop in enumerate(crops):
+        data = CROP_MARKET_DATA[crop]
+        if profiles['daily_drift'][i] or profiles['base_price'][i] != data['base_price']:
+            current_price = round(float(profiles['base_price'][i]), 2)
         else:
-            trend_factor = 1.0
-        
-        price = base_price * seasonality * fluctuation * trend_factor
-        prices.append(round(price, 2))
-        dates.append(date.strftime('%Y-%m-%d'))
-    
-    return {
-        'crop': crop,
-        'dates': dates,
-        'prices': prices,
-        'avg_price': round(np.mean(prices), 2),
-        'min_price': round(np.min(prices), 2),
-        'max_price': round(np.max(prices), 2),
-        'trend': data['trend'],
-    }
+            current_price = data['base_price']
+        trend = profiles['trend'][i]
+        yield_val = ESTIMATED_YIELD_PER_HECTARE.get(crop, 0)
+
+        index[crop] = {
+            'crop': crop,
+            'current_price': current_price,
+            'demand': data['demand'],
+            'trend': trend,
+            'demand_insights': DEMAND_INSIGHTS.get(data['demand'], ()),
+            'trend_insight': TREND_INSIGHTS[trend],
+            'estimated_yield_per_hectare': yield_val,
+            'estimated_revenue_per_hectare': round(yield_val * current_price, 2),
+        }
+    return MappingProxyType(index)
+
+
+def insights_index():
+    """
+    The shared insights index, built once and rebuilt only when the price
+    store (or MODEL_VERSION) or the market date changes.
+    """
+    key = (data_version(), market_today())
+    if _insights_index['key'] != key:
+        _insights_index['crops'] = _build_insights_index(key[1])
+        _insights_index['key'] = key
+    return _insights_index['crops']
+
+
+def _insights_dict(entry):
+    # Callers get their own copy; the index entries are never handed out
+    insights = entry.copy()
+    insights['demand_insights'] = list(insights['demand_insights'])
+    return insights
+
 
 def get_market_insights(crop):
     """Get detailed market insights for a crop"""
-    if crop not in CROP_MARKET_DATA:
-        return None
-    
-    data = CROP_MARKET_DATA[crop]
-    
-    # Generate demand forecast
-    demand_levels = {
-        'High': ['Very strong market', 'Good selling opportunity', 'Limited surplus risk'],
-        'Medium': ['Moderate market activity', 'Fair prices expected', 'Some price volatility'],
-        'Low': ['Weak demand', 'Buyer\'s market', 'Higher storage costs needed'],
-    }
-    
-    demand_insights = demand_levels.get(data['demand'], [])
-    
-    # Generate trend insights
-    trend_insights = {
-        'Increasing': 'Prices are expected to rise. Good time to plan production.',
-        'Decreasing': 'Prices are expected to fall. Consider market timing.',
-        'Stable': 'Prices are relatively stable. Consistent returns expected.',
-    }
-    
-    # Calculate estimated profit per hectare (simplified)
-    estimated_yield_per_hectare = {
-        'Rice': 50,  # quintal
-        'Wheat': 45,
-        'Corn': 55,
-        'Maize': 55,
-        'Sugarcane': 70,
-        'Cotton': 20,
-        'Potato': 200,
-        'Tomato': 400,
-        'Onion': 250,
-        'Cabbage': 300,
-    }
-    
-    yield_val = estimated_yield_per_hectare.get(crop, 0)
-    base_price = data['base_price']
-    estimated_revenue = round(yield_val * base_price, 2)
-    
-    return {
-        'crop': crop,
-        'current_price': data['base_price'],
-        'demand': data['demand'],
-        'trend': data['trend'],
-        'demand_insights': demand_insights,
-        'trend_insight': trend_insights[data['trend']],
-        'estimated_yield_per_hectare': yield_val,
-        'estimated_revenue_per_hectare': estimated_revenue,
-    }
+    entry = insights_index().get(crop)
+    return _insights_dict(entry) if entry is not None else None
+
+
+def get_market_insights_many(crops):
+    """get_market_insights for several crops from one index lookup; unknown crops are skipped."""
+    index = insights_index()
+    return {crop: _insights_dict(index[crop]) for crop in crops if crop in index}
 
 def get_all_crops():
     """Get list of all available crops"""
     return list(CROP_MARKET_DATA.keys())
 
-def compare_crops(crops_list):
-    """Compare market metrics for multiple crops"""
-    comparison = []
-    
-    for crop in crops_list:
-        if crop in CROP_MARKET_DATA:
-            data = CROP_MARKET_DATA[crop]
-            comparison.append({
-                'crop': crop,
-                'base_price': data['base_price'],
-                'demand': data['demand'],
-                'trend': data['trend'],
-            })
-    
-    return comparison
+def compare_crops_forecast(crops_list, days_ahead=30, start=None, seeded=False):
+    """
+    Forecast several crops side by side from one forecast_matrix call.
+
+    Returns {'crops', 'dates', 'prices', 'stats'}: prices is the crop x day
+    matrix (one row per entry of 'crops', unknown crops dropped) and stats
+    one dict per crop with mean/min/max price, volatility (std of daily
+    price changes, % of the mean price) and revenue per hectare at the mean
+    price.
+    """
+    crops = [crop for crop in dict.fromkeys(crops_list) if crop in CROP_MARKET_DATA]
+    if not crops:
+        return {'crops': [], 'dates': [], 'prices': [], 'stats': []}
+
+    if start is None:
+        start = market_today() if seeded else datetime.now().date()
+    profiles = market_profiles(crops, start)
+
+    dates, prices = forecast_matrix(
+        crops, days_ahead, start=start, seeded=seeded, profiles=profiles
+    )
+    mean = prices.mean(axis=1)
+    if days_ahead > 1:
+        volatility = np.diff(prices, axis=1).std(axis=1) / mean * 100
+    else:
+        volatility = np.zeros(len(crops))
+    yields = np.array([ESTIMATED_YIELD_PER_HECTARE.get(crop, 0) for crop in crops])
+    revenue = yields * mean
+
+    stats = [
+        {
+            'crop': crop,
+            'base_price': CROP_MARKET_DATA[crop]['base_price'],
+            'demand': CROP_MARKET_DATA[crop]['demand'],
+            'trend': profiles['trend'][i],
+            'mean_price': round(float(mean[i]), 2),
+            'min_price': float(prices[i].min()),
+            'max_price': float(prices[i].max()),
+            'volatility': round(float(volatility[i]), 2),
+            'estimated_yield_per_hectare': int(yields[i]),
+            'estimated_revenue_per_hectare': round(float(revenue[i]), 2),
+        }
+        for i, crop in enumerate(crops)
+    ]
+
+    return {
+        'crops': crops,
+        'dates': dates,
+        'prices': prices.tolist(),
+        'stats': stats,
+    }
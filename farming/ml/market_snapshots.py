@@ -0,0 +1,111 @@
+"""
+Daily market snapshots: each crop's seeded forecast and insights stored as
+one MarketSnapshot row per (market date, crop, horizon, data version).
+
+materialize() is run by ``python manage.py materialize_market_snapshots``
+(e.g. from cron shortly after midnight IST) so the market page is a single
+indexed read; get_snapshot() computes and stores a row on a miss.
+"""
+from farming.ml import market_predict
+
+
+def compute_snapshots(crops, days_ahead, day):
+    """{crop: (forecast, insights)} for the known crops among crops."""
+    forecasts = market_predict.predict_prices_many(crops, days_ahead, start=day, seeded=True)
+    insights = market_predict.get_market_insights_many(crops)
+    return {crop: (forecasts[crop], insights[crop]) for crop in forecasts}
+
+
+def _rows(snapshots, days_ahead, day, version):
+    from farming.models import MarketSnapshot
+
+    return [
+        MarketSnapshot(
+            date=day,
+            crop=crop,
+            days_ahead=days_ahead,
+            data_version=version,
+            forecast=forecast,
+            insights=insights,
+        )
+        for crop, (forecast, insights) in snapshots.items()
+    ]
+
+
+def materialize(crops=None, days_ahead=30, prune=True):
+    """
+    Write today's snapshots for crops (default: all), replacing any rows
+    already there for the same key. With prune, rows from earlier days
+    are deleted. Returns the number of snapshots written.
+    """
+    from farming.models import MarketSnapshot
+
+    day = market_predict.market_today()
+    version = market_predict.data_version()
+    crops = crops or market_predict.get_all_crops()
+    rows = _rows(compute_snapshots(crops, days_ahead, day), days_ahead, day, version)
+
+    MarketSnapshot.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["date", "crop", "days_ahead", "data_version"],
+        update_fields=["forecast", "insights"],
+    )
+    if prune:
+        MarketSnapshot.objects.filter(date__lt=day).delete()
+    return len(rows)
+
+
+def get_snapshot(crop, days_ahead=30):
+    """
+    (forecast, insights) for crop today, or None for an unknown crop.
+
+    Reads the materialised row; on a miss the snapshot is computed here and
+    stored for the next request.
+    """
+    from farming.models import MarketSnapshot
+
+    day = market_predict.market_today()
+    version = market_predict.data_version()
+
+    snapshot = (
+        MarketSnapshot.objects
+        .filter(date=day, crop=crop, days_ahead=days_ahead, data_version=version)
+        .values_list("forecast", "insights")
+        .first()
+    )
+    if snapshot is not None:
+        return snapshot
+
+    snapshots = compute_snapshots([crop], days_ahead, day)
+    if crop not in snapshots:
+        return None
+    MarketSnapshot.objects.bulk_create(_rows(snapshots, days_ahead, day, version), ignore_conflicts=True)
+    return snapshots[crop]
+
+
+async def aget_snapshot(crop, days_ahead=30):
+    """get_snapshot for async views: async ORM, computed in the inference pool on a miss."""
+    from farming.models import MarketSnapshot
+    from farming.offload import run_cpu
+
+    day = market_predict.market_today()
+    version = market_predict.data_version()
+
+    snapshot = await (
+        MarketSnapshot.objects
+        .filter(date=day, crop=crop, days_ahead=days_ahead, data_version=version)
+        .values_list("forecast", "insights")
+        .afirst()
+    )
+    if snapshot is not None:
+        return snapshot
+
+    snapshots = await run_cpu(compute_snapshots, [crop], days_ahead, day)
+    if crop not in snapshots:
+        return None
+    await MarketSnapshot.objects.abulk_create(
+        _rows(snapshots, days_ahead, day, version), ignore_conflicts=True
+    )
+    return snapshots[crop]
+
@@ -0,0 +1,247 @@
+"""
+Columnar store of historical daily mandi prices.
+
+Layout under the store root (PRICE_STORE_DIR, default ml/price_history/):
+
+    manifest.json                  version, market names, rows and a content
+                                   checksum per crop/month
+    <crop>/<YYYY-MM>/date.npy      datetime64[D], sorted
+    <crop>/<YYYY-MM>/market.npy    int32 index into manifest "markets"
+    <crop>/<YYYY-MM>/price.npy     float64, same unit as CROP_MARKET_DATA base_price
+
+Readers memory-map only the columns and month partitions they ask for.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.environ.get("PRICE_STORE_DIR", os.path.join(BASE_DIR, "price_history"))
+MANIFEST = "manifest.json"
+COLUMNS = ("date", "market", "price")
+
+
+def _month(value):
+    return str(np.datetime64(value, "M"))
+
+
+class PriceStore:
+    def __init__(self, root=DEFAULT_DIR):
+        self.root = root
+        self._manifest = None
+        self._manifest_mtime = None
+
+    # ---------- manifest ----------
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST)
+
+    @property
+    def manifest(self):
+        """The manifest, re-read whenever another process has rewritten it."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {"version": 0, "markets": [], "crops": {}}
+
+        if mtime != self._manifest_mtime:
+            with open(self.manifest_path) as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    def crops(self):
+        return sorted(self.manifest["crops"])
+
+    def months(self, crop):
+        return sorted(self.manifest["crops"].get(crop, {}))
+
+    def markets(self):
+        return list(self.manifest["markets"])
+
+    def month_checksums(self, crop):
+        """{month: checksum of its rows}; changes whenever a row is added or replaced."""
+        checksums = self.manifest.get("checksums", {}).get(crop, {})
+        # Stores written before checksums were recorded: fall back to row counts
+        return {
+            month: checksums.get(month, f"rows:{rows}")
+            for month, rows in self.manifest["crops"].get(crop, {}).items()
+        }
+
+    def _save_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partition_dir(self, crop, month):
+        if os.sep in crop or crop.startswith("."):
+            raise ValueError(f"Invalid crop name: {crop!r}")
+        return os.path.join(self.root, crop, month)
+
+    # ---------- reading ----------
+
+    def read(self, crop, start=None, end=None, columns=("date", "price"), markets=None):
+        """
+        Rows for one crop with start <= date <= end (either side optional).
+
+        Only the requested columns of the overlapping month partitions are
+        memory-mapped. markets optionally restricts to those market names.
+        Returns {column: array}, sorted by date.
+        """
+        columns = tuple(columns)
+        wanted = set(columns) | {"date"} | ({"market"} if markets else set())
+        start = np.datetime64(start, "D") if start is not None else None
+        end = np.datetime64(end, "D") if end is not None else None
+
+        months = [
+            month for month in self.months(crop)
+            if (start is None or month >= _month(start))
+            and (end is None or month <= _month(end))
+        ]
+
+        parts = {column: [] for column in wanted}
+        for month in months:
+            directory = self._partition_dir(crop, month)
+            try:
+                data = {
+                    column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+                    for column in wanted
+                }
+            except FileNotFoundError:
+                continue  # partition being rewritten by an import
+
+            dates = data["date"]
+            lo = np.searchsorted(dates, start, "left") if start is not None else 0
+            hi = np.searchsorted(dates, end, "right") if end is not None else len(dates)
+            rows = slice(lo, hi)
+
+            if markets:
+                names = self.markets()
+                ids = [names.index(m) for m in markets if m in names]
+                keep = np.isin(data["market"][rows], ids)
+            else:
+                keep = None
+
+            for column in wanted:
+                values = data[column][rows]
+                parts[column].append(values[keep] if keep is not None else values)
+
+        empty = {"date": "datetime64[D]", "market": np.int32, "price": np.float64}
+        return {
+            column: np.concatenate(parts[column]) if parts[column]
+            else np.empty(0, dtype=empty[column])
+            for column in columns
+        }
+
+    def daily_means(self, crop, start=None, end=None, markets=None):
+        """(dates, mean price across markets) for each day with data."""
+        data = self.read(crop, start, end, columns=("date", "price"), markets=markets)
+        if not len(data["date"]):
+            return data["date"], data["price"]
+
+        dates, inverse = np.unique(data["date"], return_inverse=True)
+        totals = np.bincount(inverse, weights=data["price"])
+        counts = np.bincount(inverse)
+        return dates, totals / counts
+
+    # ---------- writing ----------
+
+    def write(self, frame):
+        """
+        Merge a DataFrame with crop, market, date and price columns into
+        the store. Rows for an existing (crop, date, market) replace the
+        stored ones. Returns the number of rows written.
+        """
+        if frame.empty:
+            return 0
+
+        os.makedirs(self.root, exist_ok=True)
+        manifest = json.loads(json.dumps(self.manifest))
+        market_ids = {name: i for i, name in enumerate(manifest["markets"])}
+        for name in frame["market"].unique():
+            if name not in market_ids:
+                market_ids[name] = len(manifest["markets"])
+                manifest["markets"].append(name)
+
+        frame = pd.DataFrame({
+            "crop": frame["crop"].to_numpy(),
+            "date": pd.to_datetime(frame["date"]).to_numpy().astype("datetime64[D]"),
+            "market": frame["market"].map(market_ids).to_numpy(dtype=np.int32),
+            "price": frame["price"].to_numpy(dtype=np.float64),
+        })
+        frame["month"] = frame["date"].to_numpy().astype("datetime64[M]").astype(str)
+
+        for (crop, month), group in frame.groupby(["crop", "month"], sort=False):
+            rows, checksum = self._merge_partition(
+                crop, month,
+                group["date"].to_numpy().astype("datetime64[D]"),
+                group["market"].to_numpy(),
+                group["price"].to_numpy(),
+            )
+            manifest["crops"].setdefault(crop, {})[month] = rows
+            manifest.setdefault("checksums", {}).setdefault(crop, {})[month] = checksum
+
+        manifest["version"] += 1
+        self._save_manifest(manifest)
+        return len(frame)
+
+    def _merge_partition(self, crop, month, dates, markets, prices):
+        directory = self._partition_dir(crop, month)
+
+        if os.path.isdir(directory):
+            old = {
+                column: np.load(os.path.join(directory, f"{column}.npy"))
+                for column in COLUMNS
+            }
+            dates = np.concatenate([old["date"], dates])
+            markets = np.concatenate([old["market"], markets])
+            prices = np.concatenate([old["price"], prices])
+
+        # Keep the last row per (date, market), ordered by date then market
+        key = dates.astype(np.int64) * (1 << 31) + markets
+        _, last = np.unique(key[::-1], return_index=True)
+        order = len(key) - 1 - last
+
+        columns = {
+            "date": dates[order],
+            "market": markets[order].astype(np.int32),
+            "price": prices[order],
+        }
+        digest = hashlib.sha256()
+        for column in COLUMNS:
+            digest.update(np.ascontiguousarray(columns[column]).tobytes())
+
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column in COLUMNS:
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), columns[column])
+
+        old_dir = f"{directory}.old"
+        if os.path.isdir(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        return len(order), digest.hexdigest()[:16]
+
+
+_store = None
+
+
+def get_price_store():
+    """The shared PriceStore, or None until some history has been imported."""
+    global _store
+    if _store is None:
+        _store = PriceStore()
+    return _store if _store.manifest["crops"] else None
@@ -1,18 +1,261 @@
+"""
+Train the crop RandomForest from a CSV too large to fit in memory.
+
+Run it with ``python manage.py train_crop_model path/to/crop_data.csv``.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
 import pandas as pd
+import sklearn
 from sklearn.ensemble import RandomForestClassifier
 import pickle
 
-# Load dataset
-data = pd.read_csv(r"C:\Users\Shiva\OneDrive\Desktop\crop_data.csv")
+from farming.ml.crop_predict import file_sha256
+
+# Column order must match soil_mapper.map_soil_inputs
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+LABEL_COLUMN = "label"
+CSV_DTYPES = {**{column: np.float32 for column in FEATURE_COLUMNS}, LABEL_COLUMN: str}
+
+
+def scan_csv(csv_path, chunksize=500_000):
+    """
+    One cheap pass over the CSV before training.
+
+    Returns (sorted class list, row count, SHA-256 of the file bytes).
+    """
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    classes = set()
+    n_rows = 0
+    for chunk in pd.read_csv(
+        csv_path, usecols=[LABEL_COLUMN], dtype=CSV_DTYPES, chunksize=chunksize
+    ):
+        classes.update(chunk[LABEL_COLUMN].unique())
+        n_rows += len(chunk)
+
+    return sorted(classes), n_rows, digest.hexdigest()
+
+
+def iter_chunks(csv_path, chunksize=500_000):
+    """Yield (X float32 matrix in FEATURE_COLUMNS order, y labels) per chunk."""
+    reader = pd.read_csv(
+        csv_path,
+        usecols=FEATURE_COLUMNS + [LABEL_COLUMN],
+        dtype=CSV_DTYPES,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield chunk[FEATURE_COLUMNS].to_numpy(), chunk[LABEL_COLUMN].to_numpy()
+
+
+def train_streaming(
+    csv_path,
+    chunksize=500_000,
+    n_estimators=100,
+    n_jobs=-1,
+    random_state=42,
+    log=print,
+):
+    """
+    Grow a warm-started forest chunk by chunk.
+
+    Each chunk adds its share of the n_estimators trees (spread evenly, so
+    the forest ends with exactly n_estimators), fitted on that chunk only,
+    so peak memory is one chunk. Classes missing from a chunk
+    are padded in with zero-weight rows so every tree sees the same
+    classes_. Returns (model, metadata).
+    """
+    start = time.perf_counter()
+    classes, n_rows, data_hash = scan_csv(csv_path, chunksize)
+    if n_rows == 0:
+        raise ValueError(f"{csv_path} has no rows")
+
+    n_chunks = math.ceil(n_rows / chunksize)
+    class_set = set(classes)
+
+    model = RandomForestClassifier(
+        n_estimators=0,
+        warm_start=True,
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+
+    for index, (X, y) in enumerate(iter_chunks(csv_path, chunksize), start=1):
+        # Trees in the forest once this chunk is done
+        target = math.ceil(n_estimators * index / n_chunks)
+        if target == model.n_estimators:
+            log(f"chunk {index}/{n_chunks}: skipped, fewer trees than chunks")
+            continue
+
+        weights = np.ones(len(y))
+
+        missing = sorted(class_set - set(y))
+        if missing:
+            X = np.vstack([X, np.repeat(X[:1], len(missing), axis=0)])
+            y = np.concatenate([y, np.array(missing, dtype=y.dtype)])
+            weights = np.concatenate([weights, np.zeros(len(missing))])
+
+        model.n_estimators = target
+        model.fit(X, y, sample_weight=weights)
+        log(f"chunk {index}/{n_chunks}: {len(y)} rows, {model.n_estimators} trees")
+
+    # Predictions on the web path are tiny; threads only add overhead there
+    model.n_jobs = None
+    model.warm_start = False
+
+    meta = {
+        "feature_order": FEATURE_COLUMNS,
+        "classes": [str(c) for c in model.classes_],
+        "n_estimators": len(model.estimators_),
+        "n_rows": n_rows,
+        "chunksize": chunksize,
+        "data_sha256": data_hash,
+        "source": os.path.abspath(csv_path),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "training_seconds": round(time.perf_counter() - start, 2),
+        "sklearn_version": sklearn.__version__,
+    }
+    return model, meta
+
+
+def save_model(model, meta, path):
+    """
+    Write the pickle and its ``.json`` metadata sidecar atomically.
+
+    Readers never see a half-written model: both files are written to a
+    temporary name and renamed into place, the model last.
+    """
+    sidecar = f"{os.path.splitext(path)[0]}.json"
+
+    for target, write in (
+        (sidecar, lambda f: f.write(json.dumps(meta, indent=2).encode())),
+        (path, lambda f: pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)),
+    ):
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+
+    return sidecar
+
+
+def export_forest_arrays(model, directory, source_path=None):
+    """
+    Flatten a fitted RandomForestClassifier into contiguous .npy files.
+
+    All trees go into one node table (feature, threshold, children, leaf
+    class distributions) so crop_predict.ForestArrays can memory-map it.
+    Leaf children point back at the leaf itself. The directory is replaced
+    atomically. source_path is the pickle the model came from; its hash is
+    recorded so the arrays are only served while that pickle is current.
+    """
+    if model.n_outputs_ != 1:
+        raise ValueError("Only single-output forests can be exported")
+
+    n_classes = len(model.classes_)
+    roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count, dtype=np.int32) + offset
+        is_leaf = tree.children_left == -1
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+        values.append(tree.value[:, 0, :n_classes])
+
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        "roots": np.array(roots, dtype=np.int32),
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children_left": np.concatenate(lefts),
+        "children_right": np.concatenate(rights),
+        "value": np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+    }
+    meta = {
+        "classes": [str(c) for c in model.classes_],
+        "n_features": int(model.n_features_in_),
+        "n_trees": len(model.estimators_),
+        "max_depth": int(max_depth),
+    }
+    if source_path is not None:
+        meta["source_hash"] = file_sha256(source_path)
+
+    tmp_dir = f"{directory}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+    return meta
+
+
+def verify_forest_arrays(model, directory, X):
+    """Raise ValueError unless the exported arrays reproduce predict_proba exactly."""
+    from farming.ml.crop_predict import ForestArrays
+
+    arrays = ForestArrays(directory)
+    if list(arrays.classes_) != [str(c) for c in model.classes_]:
+        raise ValueError("Exported class list does not match the model")
+
+    expected = model.predict_proba(X)
+    actual = arrays.predict_proba(X)
+    if not np.array_equal(expected, actual):
+        diff = np.abs(expected - actual).max()
+        raise ValueError(f"Exported forest differs from sklearn (max diff {diff})")
+
+
+def verification_inputs(model, n_random=2000, seed=0):
+    """Feature rows that exercise every split: exact thresholds plus random points."""
+    rng = np.random.default_rng(seed)
+    n_features = model.n_features_in_
+    thresholds = [[] for _ in range(n_features)]
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        split = tree.children_left != -1
+        for feature, threshold in zip(tree.feature[split], tree.threshold[split]):
+            thresholds[feature].append(threshold)
 
-X = data.drop("label", axis=1)
-y = data["label"]
+    low = np.array([min(t, default=0.0) - 1 for t in thresholds])
+    high = np.array([max(t, default=0.0) + 1 for t in thresholds])
+    X = rng.uniform(low, high, size=(n_random, n_features))
 
-# Train model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X, y)
+    # Rows sitting exactly on each feature's split points
+    edge_rows = []
+    for feature, values in enumerate(thresholds):
+        for value in np.unique(values):
+            row = rng.uniform(low, high)
+            row[feature] = value
+            edge_rows.append(row)
 
-# Save model
-pickle.dump(model, open("crop_model.pkl", "wb"))
+    if edge_rows:
+        X = np.vstack([X, np.array(edge_rows)])
+    return X
 
-print("Crop model trained and saved successfully")
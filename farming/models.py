@@ -36,6 +36,11 @@ class DiseaseDetection(models.Model):
     confidence = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="disease_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.disease_name}"
 
@@ -47,7 +52,7 @@ class CropRecommendation(models.Model):
         on_delete=models.CASCADE
     )
 
-    recommended_crop = models.CharField(max_length=100, default="Rice")
+    recommended_crop = models.CharField(max_length=100, default="Rice")  # top-ranked crop
 
     fertility = models.CharField(max_length=100, default="medium")
     soil_type = models.CharField(max_length=100, default="loamy")
@@ -59,9 +64,14 @@ class CropRecommendation(models.Model):
     humidity = models.FloatField(default=70)
     ph = models.FloatField(default=7.0)
 
-    recommended_crops = models.JSONField(default=list)
+    recommended_crops = models.JSONField(default=list)  # all crops, best first
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="croprec_user_created_idx"),
+        ]
+
     def __str__(self):
         return self.recommended_crop
 
@@ -69,9 +79,84 @@ class CropRecommendation(models.Model):
 
 # 3️⃣ Market Price Estimation
 class MarketPrice(models.Model):
+    """
+    One market forecast a user looked at. Only the summary is stored, with
+    the (crop, forecast_date, days_ahead, data_version) it was made for.
+    """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     crop_name = models.CharField(max_length=100)
-    location = models.CharField(max_length=100)
-    estimated_price = models.FloatField()
+    location = models.CharField(max_length=100, blank=True, default="")
+    estimated_price = models.FloatField()          # average over the horizon
+    min_price = models.FloatField(null=True, blank=True)
+    max_price = models.FloatField(null=True, blank=True)
+    trend = models.CharField(max_length=20, blank=True, default="")
+    forecast_date = models.DateField(null=True, blank=True)
+    days_ahead = models.PositiveSmallIntegerField(default=30)
+    data_version = models.CharField(max_length=32, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="market_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.crop_name}"
+
+
+# 4️⃣ Daily market snapshots (written by materialize_market_snapshots)
+class MarketSnapshot(models.Model):
+    date = models.DateField()
+    crop = models.CharField(max_length=100)
+    days_ahead = models.PositiveSmallIntegerField(default=30)
+    data_version = models.CharField(max_length=32)
+    forecast = models.JSONField()
+    insights = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "crop", "days_ahead", "data_version"],
+                name="market_snapshot_unique_day",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.crop} - {self.date}"
+
+
+# 5️⃣ Queued disease uploads (processed by run_disease_worker)
+class DiseaseJob(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    image = models.ImageField(upload_to='disease_images/')
+    content_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    worker = models.CharField(max_length=64, blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    detection = models.ForeignKey(
+        DiseaseDetection, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    error = models.CharField(max_length=255, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="disease_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - job {self.pk} ({self.status})"
@@ -0,0 +1,90 @@
+"""
+Bounded process pool for CPU-bound work from the async views.
+
+Admission control: at most INFERENCE_MAX_PENDING tasks may be running or
+queued at once. run_cpu raises Overloaded beyond that, so a view can
+answer 503 straight away instead of letting the queue grow without bound.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    """The pool already holds INFERENCE_MAX_PENDING tasks."""
+
+
+_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _init_worker():
+    # Spawned children start from scratch: set Django up (and warm up the
+    # models when FARMING_WARMUP is set) once per process
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_farm_ai.settings")
+    import django
+
+    django.setup()
+
+
+def get_pool():
+    """The shared ProcessPoolExecutor, created on first use."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.INFERENCE_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _admit():
+    global _pending
+    with _lock:
+        if _pending >= settings.INFERENCE_MAX_PENDING:
+            raise Overloaded()
+        _pending += 1
+
+
+def _release(_future=None):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _discard(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu(func, *args):
+    """
+    Await func(*args) in the pool. func and its arguments must be picklable
+    (module-level functions, plain data). Raises Overloaded when full.
+    """
+    _admit()
+    pool = get_pool()
+    try:
+        future = pool.submit(func, *args)
+    except BaseException:
+        _release()
+        raise
+    # The slot is freed when the task ends, even if the request gave up on it
+    future.add_done_callback(_release)
+
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        _discard(pool)
+        raise
@@ -1,3 +1,563 @@
-from django.test import TestCase
+import importlib
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    AsyncRequestFactory, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import page_cache_key
+from .history import timeline_page
+from .models import CropRecommendation, DiseaseDetection, DiseaseJob, MarketPrice
+
+
+class CombinedHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("farmer", password="pw")
+        self.other = User.objects.create_user("neighbour", password="pw")
+
+    def add_history(self, user, n, start=None):
+        """n rows in each table, plus a burst sharing one timestamp."""
+        start = start or timezone.now() - timedelta(days=1)
+        rows = []
+        for i in range(n):
+            when = start - timedelta(minutes=i // 2)  # pairs of equal timestamps
+            rows.append((DiseaseDetection.objects.create(
+                user=user, image="disease_images/leaf.jpg",
+                disease_name="Tomato___Late_blight", confidence=81,
+            ), when))
+            rows.append((CropRecommendation.objects.create(user=user, recommended_crop="Rice"), when))
+            rows.append((MarketPrice.objects.create(
+                user=user, crop_name="Onion", estimated_price=30.5, trend="Stable",
+            ), when))
+        for obj, when in rows:
+            type(obj).objects.filter(pk=obj.pk).update(created_at=when)
+
+    def walk(self, user, page_size):
+        seen, cursor = [], None
+        while True:
+            page = timeline_page(user, cursor, page_size=page_size)
+            seen.extend(page["entries"])
+            cursor = page["next"]
+            if cursor is None:
+                return seen
+
+    def test_one_query_per_page_regardless_of_history_size(self):
+        for n in (2, 40):
+            DiseaseDetection.objects.all().delete()
+            CropRecommendation.objects.all().delete()
+            MarketPrice.objects.all().delete()
+            self.add_history(self.user, n)
+
+            with self.assertNumQueries(1):
+                first = timeline_page(self.user, page_size=5)
+            with self.assertNumQueries(1):
+                timeline_page(self.user, first["next"], page_size=5)
+
+    def test_pages_cover_history_once_in_order(self):
+        self.add_history(self.user, 7)
+        self.add_history(self.other, 3)
+
+        entries = self.walk(self.user, page_size=4)
+        keys = [(e["kind"], e["id"]) for e in entries]
+
+        self.assertEqual(len(keys), 21)
+        self.assertEqual(len(set(keys)), 21)
+        order = [(-e["created_at"].timestamp(), e["kind"], -e["id"]) for e in entries]
+        self.assertEqual(order, sorted(order))
+
+    def test_view_query_count_does_not_grow(self):
+        self.client.force_login(self.user)
+        url = reverse("combined_history")
+
+        self.add_history(self.user, 2)
+        with self.assertNumQueries(3) as small:
+            self.client.get(url)
+
+        self.add_history(self.user, 50)
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.context["next_cursor"])
+
+    def test_crop_entries_show_every_ranked_crop(self):
+        CropRecommendation.objects.create(
+            user=self.user, recommended_crop="Rice", recommended_crops=["Rice", "Maize", "Cotton"],
+        )
+        CropRecommendation.objects.create(user=self.user, recommended_crop="Jute")
+
+        entries = timeline_page(self.user)["entries"]
+        self.assertEqual([e["crops"] for e in entries], [["Jute"], ["Rice", "Maize", "Cotton"]])
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("combined_history")), "Rice, Maize, Cotton")
+
+    def test_bad_cursor_redirects_to_first_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("combined_history"), {"before": "nonsense"})
+        self.assertRedirects(response, reverse("combined_history"))
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_page_gets_each_visitors_csrf_token(self):
+        url = reverse("index")
+        first = Client(enforce_csrf_checks=True)
+        first.get(url)
+
+        second = Client(enforce_csrf_checks=True)
+        with self.assertNumQueries(0):
+            response = second.get(url)
+
+        self.assertNotIn(b"__csrf_token_placeholder__", response.content)
+        token = response.content.split(b'name="csrfmiddlewaretoken" value="')[1].split(b'"')[0]
+        response = second.post(
+            reverse("set_language"), {"language": "hi", "next": url, "csrfmiddlewaretoken": token.decode()},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_pages_are_cached_per_language_and_not_for_users(self):
+        self.client.get(reverse("blog"), HTTP_ACCEPT_LANGUAGE="hi")
+        self.assertIsNotNone(cache.get(page_cache_key(reverse("blog"), "hi")))
+        self.assertIsNone(cache.get(page_cache_key(reverse("blog"), "en")))
+
+        cache.clear()
+        self.client.force_login(User.objects.create_user("farmer", password="pw"))
+        self.client.get(reverse("blog"))
+        self.assertIsNone(cache.get(page_cache_key(reverse("blog"), "en-in")))
+        self.assertIsNone(cache.get(page_cache_key(reverse("blog"), "en")))
+
+
+class AsyncInferenceViewTests(TestCase):
+    @override_settings(INFERENCE_MAX_PENDING=0, INFERENCE_RETRY_AFTER=7)
+    async def test_full_pool_answers_503_without_queueing(self):
+        from . import async_views
+
+        user = await User.objects.acreate(username="farmer")
+        request = AsyncRequestFactory().post(reverse("crop"), {
+            "fertility": "medium", "soil_type": "loamy", "climate": "moderate", "rainfall": "medium",
+        })
+
+        async def auser():
+            return user
+
+        request.user, request.auser = user, auser
+
+        response = await async_views.crop_recommend(request)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertFalse(await CropRecommendation.objects.aexists())
+
+
+class InferenceServiceTests(SimpleTestCase):
+    def test_batcher_groups_concurrent_requests(self):
+        from .inference_service import MicroBatcher
+
+        seen = []
+
+        def run_batch(payloads):
+            seen.append(len(payloads))
+            return [p * 2 if p >= 0 else ValueError("negative") for p in payloads]
+
+        batcher = MicroBatcher(run_batch, max_batch=4, max_wait=0.2)
+        futures = [batcher.submit(i) for i in (1, 2, 3, -1, 5)]
+
+        self.assertEqual([f.result(timeout=5) for f in futures[:3]], [2, 4, 6])
+        with self.assertRaises(ValueError):
+            futures[3].result(timeout=5)
+        self.assertEqual(futures[4].result(timeout=5), 10)
+        self.assertEqual(seen, [4, 1])
+
+    def test_bad_payload_fails_only_its_own_request(self):
+        import threading
+        from multiprocessing import Pipe
+
+        from . import inference_service
+
+        def run_batch(payloads):
+            if any(len(p) != 2 for p in payloads):
+                raise ValueError("Expected 2 features")
+            return [sum(p) for p in payloads]
+
+        batcher = inference_service.MicroBatcher(run_batch, max_batch=3, max_wait=0.2)
+        futures = [batcher.submit(p) for p in ([1, 2], [1], [3, 4])]
+        self.assertEqual(futures[0].result(timeout=5), 3)
+        self.assertEqual(futures[2].result(timeout=5), 7)
+        with self.assertRaises(ValueError):
+            futures[1].result(timeout=5)
+
+        # ValueError reaches the client as ValueError, like the in-process path
+        server_end, client_end = Pipe()
+        threading.Thread(
+            target=inference_service._serve_connection,
+            args=(server_end, {"crop": batcher}), daemon=True,
+        ).start()
+        inference_service._local.conn = client_end
+        self.addCleanup(inference_service._drop_connection)
+
+        self.assertEqual(inference_service.call("crop", [5, 6]), 11)
+        with self.assertRaisesMessage(ValueError, "Expected 2 features"):
+            inference_service.call("crop", [5])
+
+    @override_settings(INFERENCE_SERVER_SOCKET="/nonexistent/inference.sock")
+    def test_call_is_unavailable_without_server(self):
+        from . import inference_service
+
+        with self.assertRaises(inference_service.Unavailable):
+            inference_service.call("crop", ([90, 42, 43, 20.8, 82, 6.5, 202.9], 3))
+
+
+@override_settings(DISEASE_JOB_QUEUE=True)
+class DiseaseJobQueueTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create_user("farmer", password="pw")
+        self.client.force_login(self.user)
+
+    def upload(self, data):
+        return self.client.post(reverse("disease"), {
+            "image": SimpleUploadedFile("leaf.png", data, content_type="image/png"),
+            "format": "json",
+        })
+
+    def test_upload_is_queued_then_processed_by_worker(self):
+        from PIL import Image
+
+        from .disease.jobs import run_worker
+
+        png = io.BytesIO()
+        Image.new("RGB", (64, 64), (90, 140, 60)).save(png, format="PNG")
+
+        queued = [self.upload(png.getvalue()), self.upload(b"not an image")]
+        self.assertEqual([r.status_code for r in queued], [202, 202])
+        self.assertEqual(queued[0].json()["status"], "pending")
+        self.assertFalse(DiseaseDetection.objects.exists())
+
+        self.assertEqual(run_worker(batch_size=8, once=True), 2)
+
+        done = self.client.get(queued[0].json()["status_url"]).json()
+        failed = self.client.get(queued[1].json()["status_url"]).json()
+        self.assertEqual(done["status"], "done")
+        self.assertIn("disease", done)
+        self.assertEqual(failed["status"], "failed")
+
+        detection = DiseaseDetection.objects.get()
+        self.assertEqual(detection.image.name, DiseaseJob.objects.get(pk=done["job"]).image.name)
+
+    def test_status_is_private_to_the_uploader(self):
+        job_url = self.upload(b"not an image").json()["status_url"]
+
+        self.client.force_login(User.objects.create_user("neighbour", password="pw"))
+        self.assertEqual(self.client.get(job_url).status_code, 404)
+
+
+class CropBatchTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("farmer", password="pw"))
+
+    def post(self, payload):
+        return self.client.post(reverse("crop_batch"), payload, content_type="application/json")
+
+    def test_empty_batch_returns_no_results(self):
+        from .ml.crop_predict import predict_crops_batch
+
+        self.assertEqual(predict_crops_batch([]), [])
+
+        response = self.post({"plots": []})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"results": []})
+
+    def test_malformed_batches_are_rejected(self):
+        from .ml.crop_predict import predict_crops_batch
+
+        with self.assertRaises(ValueError):
+            predict_crops_batch([70, 60, 60, 25, 70, 7.0, 120])
+
+        for payload in (
+            {},
+            {"plots": 3},
+            {"plots": [["medium", "loamy"]]},
+            {"plots": [{"fertility": "volcanic", "soil_type": "loamy",
+                        "climate": "moderate", "rainfall": "medium"}]},
+            {"plots": [], "top_k": "three"},
+        ):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(payload).status_code, 400)
+
+
+class CropModelFileTests(SimpleTestCase):
+    def setUp(self):
+        from .ml import crop_predict
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_path = os.path.join(directory.name, "crop_model.pkl")
+        self.arrays_dir = os.path.join(directory.name, "crop_model_arrays")
+        for name, value in (("MODEL_PATH", self.model_path), ("ARRAYS_DIR", self.arrays_dir)):
+            patcher = mock.patch.object(crop_predict, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def train(self, seed):
+        import pickle
+
+        import numpy as np
+        from sklearn.ensemble import RandomForestClassifier
+
+        rng = np.random.default_rng(seed)
+        model = RandomForestClassifier(n_estimators=3, max_depth=3, random_state=seed)
+        model.fit(rng.random((60, 7)), rng.integers(0, 3, 60))
+        with open(self.model_path, "wb") as f:
+            pickle.dump(model, f)
+        return model
+
+    def test_retrained_pickle_wins_over_stale_arrays_and_changes_hash(self):
+        from .ml.crop_predict import model_file, model_hash
+        from .ml.train_crop_model import export_forest_arrays
+
+        export_forest_arrays(self.train(seed=1), self.arrays_dir, source_path=self.model_path)
+        self.assertEqual(model_file(), os.path.join(self.arrays_dir, "meta.json"))
+        first_hash = model_hash()
+
+        # Same shape, different trees, not exported
+        self.train(seed=2)
+        self.assertEqual(model_file(), self.model_path)
+        self.assertNotEqual(model_hash(), first_hash)
+
+
+def _reference_disease_cascade(f):
+    """The hand-written rule cascade DISEASE_RULES was compiled from."""
+    if f["yellowness"] > 28 and f["g_mean"] > 140 and f["brightness"] > 145:
+        return "Tomato___Yellow_Leaf_Curl_Virus", 76
+    if f["brightness"] > 165 and f["edge_density"] < 0.15 and (f["r_std"] + f["g_std"] + f["b_std"]) < 35:
+        return "Tomato___Mosaic_virus", 74
+    if f["brightness"] < 115 and f["greenness"] < 8 and f["spot_ratio"] > 0.18:
+        return "Tomato___Late_blight", 81
+    if 10 < f["redness"] < 30 and 120 < f["brightness"] < 150 and f["spot_ratio"] > 0.12:
+        return "Tomato___Early_blight", 80
+    if 0.20 < f["edge_density"] < 0.45 and 0.10 < f["spot_ratio"] < 0.25:
+        return "Tomato___Septoria_leaf_spot", 77
+    if 0.35 < f["edge_density"] < 0.55 and 0.15 < f["spot_ratio"] < 0.35:
+        return "Tomato___Target_Spot", 78
+    if 150 < f["brightness"] < 165 and 8 < f["redness"] < 18 and f["edge_density"] < 0.25:
+        return "Tomato___Leaf_Mold", 75
+    if f["yellowness"] > 15 and f["edge_density"] > 0.25 and f["redness"] > 8:
+        return "Tomato___Spider_mites", 72
+    if f["edge_density"] > 0.55 and f["spot_ratio"] > 0.20 and f["brightness"] < 135 and f["redness"] > 12:
+        return "Tomato___Bacterial_spot", 79
+    if f["greenness"] > 25 and f["redness"] < 5 and f["spot_ratio"] < 0.08:
+        return "Tomato___Healthy", 87
+    if f["g_mean"] > 145 and f["r_mean"] > 135:
+        return "Corn___Common_rust", 71
+    if f["greenness"] > 18:
+        return "Corn___Healthy", 73
+    if f["redness"] > 30:
+        return "Apple___Black_rot", 70
+    if f["yellowness"] > 25:
+        return "Apple___Cedar_apple_rust", 69
+    return "Healthy Leaf", 60
+
+
+class DiseaseRuleParityTests(SimpleTestCase):
+    def test_compiled_rules_match_the_cascade(self):
+        import numpy as np
+
+        from .disease.predictor import FEATURE_NAMES
+        from .disease.rules import DISEASE_RULES, CompiledRules
+
+        rng = np.random.default_rng(0)
+        n = 50_000
+        ranges = {
+            "r_mean": (0, 255), "g_mean": (0, 255), "b_mean": (0, 255),
+            "r_std": (0, 40), "g_std": (0, 40), "b_std": (0, 40),
+            "brightness": (60, 220), "greenness": (-20, 60), "redness": (-20, 60),
+            "yellowness": (-20, 60), "edge_density": (0, 1), "spot_ratio": (0, 0.6),
+        }
+        X = np.column_stack([rng.uniform(*ranges[name], n) for name in FEATURE_NAMES])
+
+        # Put half of the rows exactly on thresholds, where > and < matter
+        thresholds = {name: set() for name in FEATURE_NAMES}
+        for _, _, bounds in DISEASE_RULES:
+            for name, pair in bounds.items():
+                if name in thresholds:
+                    thresholds[name].update(b for b in pair if b is not None)
+        for column, name in enumerate(FEATURE_NAMES):
+            if thresholds[name]:
+                on_edge = rng.random(n) < 0.5
+                X[on_edge, column] = rng.choice(sorted(thresholds[name]), on_edge.sum())
+        # std_sum == 35 exactly for some rows
+        X[:1000, FEATURE_NAMES.index("r_std"):FEATURE_NAMES.index("b_std") + 1] = [10, 10, 15]
+
+        expected = [_reference_disease_cascade(dict(zip(FEATURE_NAMES, row))) for row in X.tolist()]
+        actual = CompiledRules(DISEASE_RULES, FEATURE_NAMES).classify(X)
+        mismatches = [
+            (dict(zip(FEATURE_NAMES, X[i])), actual[i], expected[i])
+            for i in range(n) if actual[i] != expected[i]
+        ]
+        self.assertEqual(mismatches[:3], [], f"{len(mismatches)} rows differ")
+
+
+
+class CompactCropRecommendationsMigrationTests(TransactionTestCase):
+    before = [("farming", "0010_history_indexes")]
+    after = [("farming", "0011_compact_crop_recommendations")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def rows(self, apps):
+        CropRecommendation = apps.get_model("farming", "CropRecommendation")
+        return sorted(
+            (row.user.username, row.soil_type, row.recommended_crop, row.recommended_crops, row.created_at)
+            for row in CropRecommendation.objects.select_related("user")
+        )
+
+    def test_folds_rows_within_the_window_and_splits_them_back(self):
+        window = importlib.import_module(
+            "farming.migrations.0011_compact_crop_recommendations"
+        ).SAME_REQUEST
+
+        apps = self.migrate(self.before)
+        User = apps.get_model("auth", "User")
+        CropRecommendation = apps.get_model("farming", "CropRecommendation")
+        farmer = User.objects.create(username="farmer")
+        neighbour = User.objects.create(username="neighbour")
+
+        start = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        seeded = [
+            # One request: same inputs, inside the window
+            (farmer, "loamy", "Rice", start),
+            (farmer, "loamy", "Maize", start + window / 2),
+            (farmer, "loamy", "Cotton", start + window),
+            # Same inputs again, just over the window after the last row
+            (farmer, "loamy", "Rice", start + window * 2 + timedelta(seconds=1)),
+            # Different inputs inside the window
+            (farmer, "clay", "Jute", start + window / 2),
+            # Another user at the same moment
+            (neighbour, "loamy", "Maize", start + window / 2),
+        ]
+        for user, soil_type, crop, created_at in seeded:
+            row = CropRecommendation.objects.create(user=user, soil_type=soil_type, recommended_crop=crop)
+            CropRecommendation.objects.filter(pk=row.pk).update(created_at=created_at)
+
+        apps = self.migrate(self.after)
+        self.assertEqual(self.rows(apps), sorted([
+            ("farmer", "clay", "Jute", ["Jute"], start + window / 2),
+            ("farmer", "loamy", "Rice", ["Rice"], start + window * 2 + timedelta(seconds=1)),
+            ("farmer", "loamy", "Rice", ["Rice", "Maize", "Cotton"], start),
+            ("neighbour", "loamy", "Maize", ["Maize"], start + window / 2),
+        ]))
+
+        # One row per crop again, each stamped with its request's time
+        apps = self.migrate(self.before)
+        self.assertEqual(self.rows(apps), sorted([
+            ("farmer", "clay", "Jute", [], start + window / 2),
+            ("farmer", "loamy", "Cotton", [], start),
+            ("farmer", "loamy", "Maize", [], start),
+            ("farmer", "loamy", "Rice", [], start),
+            ("farmer", "loamy", "Rice", [], start + window * 2 + timedelta(seconds=1)),
+            ("neighbour", "loamy", "Maize", [], start + window / 2),
+        ]))
+
+
+class ImportPriceHistoryTests(SimpleTestCase):
+    def test_crops_without_market_data_are_skipped_with_a_warning(self):
+        from django.core.management import call_command
+
+        from .ml.price_store import PriceStore
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        csv_path = os.path.join(directory.name, "prices.csv")
+        with open(csv_path, "w") as f:
+            f.write(
+                "crop,market,date,price\n"
+                "Rice,Pune,2024-01-01,2000\n"
+                "Saffron,Srinagar,2024-01-01,300000\n"
+            )
+
+        store_dir = os.path.join(directory.name, "store")
+        stderr = io.StringIO()
+        call_command("import_price_history", csv_path, store=store_dir, stdout=io.StringIO(), stderr=stderr)
+
+        self.assertEqual(PriceStore(store_dir).crops(), ["Rice"])
+        self.assertIn("Saffron (1)", stderr.getvalue())
+
+
+class DiseaseBatchTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.client.force_login(User.objects.create_user("farmer", password="pw"))
+
+    def test_entry_evicted_during_the_request_is_still_used(self):
+        from .disease import cache as disease_cache
+
+        entry = {"disease": "Tomato___Late_blight", "confidence": 81, "image": "disease_images/gone.png"}
+        lookups = iter([entry])
+
+        # Hit on the first lookup, evicted for any later one
+        with mock.patch.object(disease_cache, "lookup", lambda key: next(lookups, None)):
+            response = self.client.post(reverse("disease_batch"), {
+                "images": [SimpleUploadedFile("leaf.png", b"leaf bytes", content_type="image/png")],
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["disease"], "Tomato - Late_blight")
+
+
+class PriceForecastRefitTests(SimpleTestCase):
+    def test_prices_corrected_in_an_earlier_month_trigger_a_full_fit(self):
+        import pandas as pd
+
+        from .ml import forecasting
+        from .ml.price_store import PriceStore
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(forecasting._fits.clear)
+        store = PriceStore(directory.name)
+
+        days = pd.date_range("2024-01-01", "2024-06-30")
+        frame = pd.DataFrame({"crop": "Rice", "market": "Pune", "date": days, "price": 2000.0})
+        store.write(frame)
+        forecasting.get_fit("Rice", store)
+
+        # Same rows, corrected prices: January's row count doesn't change
+        january = frame[frame["date"] < "2024-02-01"].assign(price=2500.0)
+        store.write(january)
+        self.assertEqual(store.manifest["crops"]["Rice"]["2024-01"], 31)
+
+        with mock.patch.object(forecasting, "fit_series", wraps=forecasting.fit_series) as fit_series:
+            forecasting.get_fit("Rice", store)
+        fit_series.assert_called_once()
@@ -1,15 +1,24 @@
 from django.urls import include, path
 from . import views
-from .views import disease_detection, market_prediction, signup, login_user, logout_user, dashboard, blog_and_news
+from .views import signup, login_user, logout_user, dashboard, blog_and_news
 from django.conf import settings
 from django.conf.urls.static import static
 
+if settings.FARMING_ASYNC_VIEWS:
+    from . import async_views as inference_views
+else:
+    inference_views = views
+
 urlpatterns = [
     path('', views.index, name='index'),
     path('dashboard/', dashboard, name='dashboard'),
-    path('crop/', views.crop_recommend, name='crop'),
-    path("disease/", disease_detection, name="disease"),
-    path("market/", market_prediction, name="market"),
+    path('crop/', inference_views.crop_recommend, name='crop'),
+    path('crop/batch/', views.crop_recommend_batch, name='crop_batch'),
+    path("disease/", inference_views.disease_detection, name="disease"),
+    path("disease/batch/", views.disease_detection_batch, name="disease_batch"),
+    path("disease/jobs/<int:job_id>/", views.disease_job_status, name="disease_job"),
+    path("market/", inference_views.market_prediction, name="market"),
+    path("market/compare/", views.market_comparison, name="market_compare"),
     path('blog/', blog_and_news, name='blog'),
     path('signup/', signup, name='signup'),
     path('login/', login_user, name='login'),
@@ -1,14 +1,27 @@
-from django.shortcuts import render, redirect
+import json
+import os
+import zipfile
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 # from django.http import HttpResponse
 # from django.contrib.auth.models import UserProfile
-from django.core.files.storage import FileSystemStorage
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .caching import cache_anonymous_page
 from .forms import SignUpForm, LoginForm
-from .models import DiseaseDetection, CropRecommendation, MarketPrice
+from .models import DiseaseDetection, DiseaseJob, CropRecommendation, MarketPrice
 
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
 
+
+@cache_anonymous_page
 def index(request):
     return render(request, 'farming/index.html')
 
@@ -21,7 +34,7 @@ def dashboard(request):
 
 @login_required(login_url='login')
 def crop_recommend(request):
-    from farming.ml.crop_predict import predict_crops
+    from farming.ml.crop_table import lookup_crops
     from farming.ml.soil_mapper import map_soil_inputs
     from farming.models import CropRecommendation
 
@@ -39,36 +52,79 @@ def crop_recommend(request):
             fertility, soil_type, climate, rainfall
         )
 
-        data = [N, P, K, temperature, humidity, ph, rainfall_mm]
-
-        # 🔥 Predict multiple crops
+        # 🔥 Predict multiple crops (precomputed table, model as fallback)
         try:
-            results = predict_crops(data, top_k=3)
+            results = lookup_crops(fertility, soil_type, climate, rainfall, top_k=3)
         except FileNotFoundError as exc:
             error = str(exc)
             results = None
 
-        # 🔥 Save each crop
+        # 🔥 Save the request once, with the ranked crops
         if results:
-            for r in results:
-                CropRecommendation.objects.create(
-                    user=request.user,
-                    recommended_crop=r["crop"],
-                    fertility=fertility,
-                    soil_type=soil_type,
-                    climate=climate,
-                    rainfall_level=rainfall,   # "medium"
-                    rainfall=rainfall_mm,      # 120
-                    temperature=temperature,
-                    humidity=humidity,
-                    ph=ph,
-                )
+            CropRecommendation.objects.create(
+                user=request.user,
+                recommended_crop=results[0]["crop"],
+                recommended_crops=[r["crop"] for r in results],
+                fertility=fertility,
+                soil_type=soil_type,
+                climate=climate,
+                rainfall_level=rainfall,   # "medium"
+                rainfall=rainfall_mm,      # 120
+                temperature=temperature,
+                humidity=humidity,
+                ph=ph,
+            )
 
         result = results
 
     return render(request, 'farming/crop.html', {'result': result, 'error': error})
 
+
+@login_required(login_url='login')
+@require_POST
+def crop_recommend_batch(request):
+    """
+    Score many plots in one request.
+
+    Expects a JSON body like
+    {"top_k": 3, "plots": [{"fertility": "medium", "soil_type": "loamy",
+                            "climate": "moderate", "rainfall": "medium"}, ...]}
+    """
+    from farming.ml.crop_predict import predict_crops_batch
+    from farming.ml.soil_mapper import map_soil_inputs
+
+    try:
+        payload = json.loads(request.body)
+        plots = payload["plots"]
+        top_k = int(payload.get("top_k", 3))
+        features = [
+            map_soil_inputs(
+                plot["fertility"], plot["soil_type"], plot["climate"], plot["rainfall"]
+            )
+            for plot in plots
+        ]
+    except (ValueError, KeyError, TypeError) as exc:
+        return JsonResponse({"error": f"Invalid request: {exc}"}, status=400)
+
+    if not features:
+        return JsonResponse({"results": []})
+
+    try:
+        results = predict_crops_batch(features, top_k=top_k)
+    except FileNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=503)
+    except ValueError as exc:
+        return JsonResponse({"error": f"Invalid request: {exc}"}, status=400)
+
+    return JsonResponse({
+        "results": [
+            {"plot": plot, "crops": [r["crop"] for r in crops]}
+            for plot, crops in zip(plots, results)
+        ]
+    })
+
 def disease_detection(request):
+    from farming.disease import cache as disease_cache
     from farming.disease.predictor import predict_disease
     result = None
 
@@ -79,44 +135,173 @@ def disease_detection(request):
             messages.error(request, "Please upload a plant leaf image.")
             return redirect("disease")
 
-        # Save image temporarily
-        fs = FileSystemStorage()
-        saved_image_name = fs.save(image.name, image)
-        image_path = fs.path(saved_image_name)
+        if settings.DISEASE_JOB_QUEUE:
+            return enqueue_disease_job(request, image)
 
         try:
-            # Predict disease using rule-based method
-            disease, confidence = predict_disease(image_path)
-
-            disease = disease.replace("___", " - ")
-            confidence = round(confidence, 2)
+            data = image.read()
+            key = disease_cache.content_hash(data)
+            cached = disease_cache.lookup(key)
+
+            if cached:
+                # Same bytes seen before: reuse the result and the stored file
+                disease, confidence = cached["disease"], cached["confidence"]
+                stored_name = cached["image"]
+                if not default_storage.exists(stored_name):
+                    stored_name = None
+            else:
+                # Predict disease using rule-based method, straight from the upload
+                disease, confidence = predict_disease(data)
+                stored_name = None
 
-            # Save to database
-            DiseaseDetection.objects.create(
+            detection = DiseaseDetection(
                 user=request.user,
-                image=image,
-                disease_name=disease,
-                confidence=confidence
+                disease_name=disease.replace("___", " - "),
+                confidence=round(confidence, 2)
             )
+            if stored_name:
+                detection.image.name = stored_name
+            else:
+                # The only time these bytes are written to disk
+                image.seek(0)
+                detection.image = image
+            detection.save()
+
+            disease_cache.remember(key, disease, confidence, detection.image.name)
 
             result = {
-                "disease": disease,
-                "confidence": confidence
+                "disease": detection.disease_name,
+                "confidence": detection.confidence
             }
 
         except Exception as e:
             messages.error(request, f"Error processing image: {str(e)}")
-            fs.delete(saved_image_name)
             return redirect("disease")
 
-        # Optionally delete temp image to save storage
-        fs.delete(saved_image_name)
-
     return render(request, "farming/disease.html", {"result": result})
 
 
+def enqueue_disease_job(request, image):
+    """Queue an upload for run_disease_worker and answer with the job id straight away."""
+    from farming.disease.jobs import enqueue, job_status
+
+    if not request.user.is_authenticated:
+        messages.error(request, "Please log in to analyse leaf images.")
+        return redirect("login")
+
+    job = enqueue(request.user, image)
+    status = job_status(job)
+    status["status_url"] = reverse("disease_job", args=[job.pk])
+
+    if request.POST.get("format") == "json":
+        return JsonResponse(status, status=202)
+    return render(request, "farming/disease.html", {"job": status})
+
+
+@login_required(login_url='login')
+def disease_job_status(request, job_id):
+    from farming.disease.jobs import job_status
+
+    job = get_object_or_404(
+        DiseaseJob.objects.select_related("detection"), pk=job_id, user=request.user
+    )
+    return JsonResponse(job_status(job))
+
+
+def _batch_uploads(request):
+    """
+    (filename, bytes) pairs from a multi-file "images" field and/or a zip
+    "archive", capped by DISEASE_BATCH_MAX_FILES / DISEASE_BATCH_MAX_BYTES.
+    """
+    max_files = settings.DISEASE_BATCH_MAX_FILES
+    max_bytes = settings.DISEASE_BATCH_MAX_BYTES
+    uploads = [(f.name, f.read()) for f in request.FILES.getlist("images")]
+
+    archive = request.FILES.get("archive")
+    if archive:
+        with zipfile.ZipFile(archive) as zf:
+            members = [
+                info for info in zf.infolist()
+                if not info.is_dir()
+                and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+            ]
+            if len(uploads) + len(members) > max_files:
+                raise ValueError(f"At most {max_files} images per batch")
+            if sum(info.file_size for info in members) > max_bytes:
+                raise ValueError("Archive is too large")
+            uploads += [(os.path.basename(info.filename), zf.read(info)) for info in members]
+
+    if len(uploads) > max_files:
+        raise ValueError(f"At most {max_files} images per batch")
+    return uploads
+
+
+@login_required(login_url='login')
+@require_POST
+def disease_detection_batch(request):
+    """Classify a camera roll in one request (multi-file "images" or zip "archive")."""
+    from farming.disease import cache as disease_cache
+    from farming.disease.predictor import predict_disease_batch
+
+    try:
+        uploads = _batch_uploads(request)
+    except (ValueError, zipfile.BadZipFile) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if not uploads:
+        return JsonResponse({"error": "Please upload plant leaf images."}, status=400)
+
+    keys = [disease_cache.content_hash(data) for _, data in uploads]
+
+    # One cache lookup per distinct image: entries can be evicted meanwhile
+    cached_entries = {key: disease_cache.lookup(key) for key in dict.fromkeys(keys)}
+
+    # Decode and classify each distinct, uncached image once
+    pending = {}
+    for key, (_, data) in zip(keys, uploads):
+        if key not in pending and not cached_entries[key]:
+            pending[key] = data
+    predictions = dict(zip(pending, predict_disease_batch(list(pending.values()))))
+
+    detections, results = [], []
+    stored_names = {}
+    for key, (name, data) in zip(keys, uploads):
+        cached = cached_entries[key]
+        prediction = (cached["disease"], cached["confidence"]) if cached else predictions[key]
+        if prediction is None:
+            results.append({"file": name, "error": "Could not read image"})
+            continue
+
+        disease, confidence = prediction
+        detection = DiseaseDetection(
+            user=request.user,
+            disease_name=disease.replace("___", " - "),
+            confidence=round(confidence, 2),
+        )
+
+        stored_name = stored_names.get(key) or (cached and cached["image"])
+        if stored_name and default_storage.exists(stored_name):
+            detection.image.name = stored_name
+        else:
+            detection.image.save(name, ContentFile(data), save=False)
+        stored_names[key] = detection.image.name
+        disease_cache.remember(key, disease, confidence, detection.image.name)
+
+        detections.append(detection)
+        results.append({
+            "file": name,
+            "disease": detection.disease_name,
+            "confidence": detection.confidence,
+        })
+
+    DiseaseDetection.objects.bulk_create(detections)
+
+    return JsonResponse({"results": results})
+
+
 def market_prediction(request):
-    from farming.ml.market_predict import predict_prices, get_market_insights, get_all_crops, compare_crops
+    from farming.ml.market_cache import get_comparison
+    from farming.ml.market_snapshots import get_snapshot
+    from farming.ml.market_predict import data_version as market_data_version, get_all_crops
     result = None
     crops = get_all_crops()
     comparison = None
@@ -126,44 +311,80 @@ def market_prediction(request):
         action = request.POST.get('action', 'predict')
         
         if action == 'predict' and crop:
-            result = predict_prices(crop, days_ahead=30)
-            result['insights'] = get_market_insights(crop)
+            # Same numbers all day: seeded forecast, materialised per market date
+            snapshot = get_snapshot(crop, days_ahead=30)
+            if snapshot:
+                forecast, insights = snapshot
+                result = dict(forecast)
+                result['insights'] = insights
             
-            # Zip dates and prices together for easier template iteration
-            result['forecast'] = list(zip(result['dates'], result['prices']))
+                # Zip dates and prices together for easier template iteration
+                result['forecast'] = list(zip(result['dates'], result['prices']))
         
         elif action == 'compare':
             selected_crops = request.POST.getlist('compare_crops')
-            comparison = compare_crops(selected_crops)
+            comparison = get_comparison(selected_crops, days_ahead=30)
+            if request.POST.get('format') == 'json':
+                return JsonResponse(comparison)
             
-        MarketPrice.objects.create(
-            user=request.user,
-            crop_name=crop,
-            estimated_price=result
-        )
+        if result and request.user.is_authenticated:
+            # Summary plus a reference to the snapshot, not the whole series
+            MarketPrice.objects.create(
+                user=request.user,
+                crop_name=crop,
+                estimated_price=result['avg_price'],
+                min_price=result['min_price'],
+                max_price=result['max_price'],
+                trend=result['trend'],
+                forecast_date=result['dates'][0],
+                days_ahead=len(result['dates']),
+                data_version=market_data_version(),
+            )
     return render(request, 'farming/market.html', {
         'result': result,
         'crops': crops,
-        'comparison': comparison
+        'comparison': comparison['stats'] if comparison else None,
     })
 
+
+def market_comparison(request):
+    """
+    Batched forecast comparison as JSON, e.g.
+    GET market/compare/?crops=Rice&crops=Wheat&days=30
+    """
+    from farming.ml.market_cache import get_comparison
+
+    crops = request.GET.getlist('crops')
+    try:
+        days_ahead = int(request.GET.get('days', 30))
+    except ValueError:
+        return JsonResponse({"error": "days must be an integer"}, status=400)
+    if not crops or not 1 <= days_ahead <= 365:
+        return JsonResponse({"error": "Pick at least one crop and 1-365 days"}, status=400)
+
+    return JsonResponse(get_comparison(crops, days_ahead=days_ahead))
+
     
 
 @login_required
 
 @login_required
 def combined_history(request):
-    disease_history = DiseaseDetection.objects.filter(user=request.user)
-    crop_history = CropRecommendation.objects.filter(user=request.user)
-    market_history = MarketPrice.objects.filter(user=request.user)
+    """All of the user's history in one timeline, newest first, a page at a time."""
+    from farming.history import timeline_page
+
+    try:
+        page = timeline_page(request.user, request.GET.get('before'))
+    except ValueError:
+        return redirect('combined_history')
 
     return render(
         request,
         'farming/combined_history.html',
         {
-            'disease_history': disease_history,
-            'crop_history': crop_history,
-            'market_history': market_history,
+            'entries': page['entries'],
+            'next_cursor': page['next'],
+            'is_first_page': not request.GET.get('before'),
         }
     )
 
@@ -232,6 +453,7 @@ def logout_user(request):
     messages.success(request, 'You have been logged out successfully.')
     return redirect('index')
 
+@cache_anonymous_page
 def blog_and_news(request):
     """Blog, news, facts, and market trends page"""
     return render(request, 'farming/blog.html')
@@ -0,0 +1,91 @@
+"""
+Load the ML components up front so forked workers share them.
+
+Run from FarmingConfig.ready() when FARMING_WARMUP is set; with gunicorn's
+preload_app (see gunicorn.conf.py) that happens once in the master before fork.
+"""
+import io
+import logging
+import os
+import resource
+import time
+
+logger = logging.getLogger(__name__)
+
+REPORT = []  # [{"component", "seconds", "rss_mb"}] from the last warm_up()
+
+
+def _rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _warm_crop_model():
+    from farming.ml.crop_predict import load_model
+    load_model()
+
+
+def _warm_crop_table():
+    from farming.ml.crop_table import load_table
+    load_table()
+
+
+def _warm_disease_pipeline():
+    from PIL import Image
+    from farming.disease.predictor import predict_disease
+
+    Image.init()
+
+    # One tiny round trip through decode + feature extraction + rules
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (90, 140, 60)).save(buffer, format="PNG")
+    buffer.seek(0)
+    predict_disease(buffer)
+
+
+def _warm_market_tables():
+    from farming.ml.market_predict import insights_index
+
+    insights_index()
+
+
+COMPONENTS = [
+    ("crop_model", _warm_crop_model),
+    ("crop_table", _warm_crop_table),
+    ("disease_pipeline", _warm_disease_pipeline),
+    ("market_tables", _warm_market_tables),
+]
+
+
+def warm_up():
+    """Load every component, recording load time and RSS growth for each."""
+    REPORT.clear()
+
+    for name, loader in COMPONENTS:
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        try:
+            loader()
+        except Exception as exc:
+            # A missing model must not stop the site from starting
+            logger.warning("warm-up of %s failed: %s", name, exc)
+            continue
+
+        entry = {
+            "component": name,
+            "seconds": round(time.perf_counter() - start, 3),
+            "rss_mb": round(_rss_mb() - rss_before, 1),
+        }
+        REPORT.append(entry)
+        logger.info(
+            "warmed %s in %.3fs (+%.1f MB RSS)",
+            name, entry["seconds"], entry["rss_mb"],
+        )
+
+    logger.info("warm-up done, process RSS %.1f MB", _rss_mb())
+    return REPORT
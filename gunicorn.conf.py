@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for Smart Farm AI.
+
+The app is imported once in the master so the crop model, disease pipeline
+and market tables are loaded before fork and shared copy-on-write.
+"""
+import gc
+import os
+
+os.environ.setdefault("FARMING_WARMUP", "1")
+
+wsgi_app = "smart_farm_ai.wsgi:application"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+
+def when_ready(server):
+    from farming.warmup import REPORT
+
+    for entry in REPORT:
+        server.log.info(
+            "warmed %s in %.3fs (+%.1f MB RSS)",
+            entry["component"], entry["seconds"], entry["rss_mb"],
+        )
+
+    # Keep the preloaded objects out of the collector so workers don't
+    # touch (and un-share) their pages
+    gc.freeze()
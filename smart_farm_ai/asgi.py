@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_farm_ai.settings')
+# Serve crop/, disease/ and market/ from farming.async_views
+os.environ.setdefault('FARMING_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -24,7 +24,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # SECRET_KEY = 'django-insecure-(%v&cg-t+d5du)h9xl3%3hgc$8+8)@7@a6l7zuboc)th7!=8c4'
 
 # # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "True") == "True"
 
 ALLOWED_HOSTS = ["*"]
 
@@ -61,13 +61,22 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are kept in memory outside DEBUG
+            'loaders': [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ] if DEBUG else [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -79,13 +88,90 @@ WSGI_APPLICATION = 'smart_farm_ai.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE=sqlite (default) or postgres; everything else comes from the
+# environment too, so production can switch without editing this file.
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    # Needs psycopg 3 (pip install "psycopg[binary,pool]").
+    # DB_POOL_MAX_SIZE > 0 uses Django's connection pool, which replaces
+    # persistent connections; otherwise connections live DB_CONN_MAX_AGE s.
+    pool_max_size = int(os.environ.get("DB_POOL_MAX_SIZE", 0))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("DB_NAME", "smart_farm_ai"),
+            'USER': os.environ.get("DB_USER", ""),
+            'PASSWORD': os.environ.get("DB_PASSWORD", ""),
+            'HOST': os.environ.get("DB_HOST", ""),
+            'PORT': os.environ.get("DB_PORT", ""),
+            'CONN_MAX_AGE': 0 if pool_max_size else int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                    'max_size': pool_max_size,
+                    'timeout': float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+                },
+            } if pool_max_size else {},
+        }
+    }
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DB_NAME", BASE_DIR / 'db.sqlite3'),
+        }
+    }
+    # SQLITE_TUNING=1 (for multi-worker deployments): WAL so readers
+    # don't block the writer, synchronous=NORMAL (safe under WAL), a busy
+    # timeout instead of immediate "database is locked", memory-mapped
+    # reads, and write transactions that take the lock up front (no
+    # deadlocking read-to-write upgrades between workers). Off by default:
+    # WAL is recorded in the database file header, which would rewrite the
+    # development db.sqlite3 on every checkout that connects to it.
+    if os.environ.get("SQLITE_TUNING", "0") == "1":
+        DATABASES['default']['OPTIONS'] = {
+            'timeout': int(os.environ.get("SQLITE_BUSY_TIMEOUT", 20)),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))};"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+        }
+else:
+    raise ValueError(f"Unsupported DB_ENGINE: {DB_ENGINE!r} (use sqlite or postgres)")
+
+
+# Cache
+# CACHE_BACKEND=locmem (default, per process), file (CACHE_LOCATION is a
+# directory shared by all workers) or redis (CACHE_LOCATION is a redis://
+# URL; needs the redis package). Bump CACHE_VERSION on deploys that change
+# templates so file/redis caches don't serve old pages.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "smart-farm-ai"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", BASE_DIR / "cache"),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ValueError(f"Unsupported CACHE_BACKEND: {CACHE_BACKEND!r}")
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get("CACHE_LOCATION", CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.environ.get("CACHE_TIMEOUT", 300)),
+        'KEY_PREFIX': 'fasal',
+        'VERSION': int(os.environ.get("CACHE_VERSION", 1)),
     }
 }
 
+# Anonymous index/blog pages are served from the cache this long (0 = off)
+PAGE_CACHE_SECONDS = int(os.environ.get("PAGE_CACHE_SECONDS", 600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -138,3 +224,40 @@ SECRET_KEY = os.environ.get(
 )
 # DEBUG = os.environ.get("DEBUG") == "True"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# Load the crop model, disease pipeline and market tables at startup
+# instead of on the first request (set by gunicorn.conf.py)
+FARMING_WARMUP = os.environ.get("FARMING_WARMUP") == "1"
+
+# Per-process LRU of disease results keyed by upload content hash
+DISEASE_RESULT_CACHE_SIZE = int(os.environ.get("DISEASE_RESULT_CACHE_SIZE", 1024))
+
+# Limits for the multi-image / zip disease upload
+DISEASE_BATCH_MAX_FILES = int(os.environ.get("DISEASE_BATCH_MAX_FILES", 200))
+DISEASE_BATCH_MAX_BYTES = int(os.environ.get("DISEASE_BATCH_MAX_BYTES", 100 * 1024 * 1024))
+
+# Async inference views (routed when FARMING_ASYNC_VIEWS=1, set by asgi.py):
+# size of the process pool, and how many tasks may be running or queued
+# before requests are turned away with 503 + Retry-After
+FARMING_ASYNC_VIEWS = os.environ.get("FARMING_ASYNC_VIEWS") == "1"
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", os.cpu_count() or 1))
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", 4 * INFERENCE_PROCESSES))
+INFERENCE_RETRY_AFTER = int(os.environ.get("INFERENCE_RETRY_AFTER", 5))
+
+# Local inference server (python manage.py run_inference_server). When its
+# socket is up, predict_crops / predict_disease send requests there to be
+# micro-batched: up to MAX_BATCH requests, waiting at most MAX_WAIT_MS for
+# the batch to fill. Without it, inference runs in-process.
+INFERENCE_SERVER_SOCKET = os.environ.get("INFERENCE_SERVER_SOCKET", str(BASE_DIR / "inference.sock"))
+INFERENCE_SERVER_MAX_BATCH = int(os.environ.get("INFERENCE_SERVER_MAX_BATCH", 32))
+INFERENCE_SERVER_MAX_WAIT_MS = float(os.environ.get("INFERENCE_SERVER_MAX_WAIT_MS", 5))
+INFERENCE_SERVER_TIMEOUT = float(os.environ.get("INFERENCE_SERVER_TIMEOUT", 10))
+
+# Background disease queue: with DISEASE_JOB_QUEUE=1 the disease view stores
+# the upload as a job and returns its id; run_disease_worker claims jobs in
+# batches. Running jobs older than DISEASE_JOB_TIMEOUT seconds are retried.
+DISEASE_JOB_QUEUE = os.environ.get("DISEASE_JOB_QUEUE") == "1"
+DISEASE_JOB_BATCH_SIZE = int(os.environ.get("DISEASE_JOB_BATCH_SIZE", 16))
+DISEASE_JOB_POLL_SECONDS = float(os.environ.get("DISEASE_JOB_POLL_SECONDS", 1))
+DISEASE_JOB_TIMEOUT = int(os.environ.get("DISEASE_JOB_TIMEOUT", 300))
+DISEASE_JOB_MAX_ATTEMPTS = int(os.environ.get("DISEASE_JOB_MAX_ATTEMPTS", 3))